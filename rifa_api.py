@@ -0,0 +1,217 @@
+"""API JSON de solo lectura con la disponibilidad de números, servida desde la caché en memoria
+
+Pensada para revendedores y bots que solo necesitan saber si un número está libre
+y cuántos quedan. Corre en un hilo junto a la aplicación de Streamlit y los pedidos
+nunca consultan Google Sheets: responden con la última lectura en memoria. Un hilo
+aparte actualiza esa lectura cada PROBE_INTERVAL_SECONDS para las rifas consultadas,
+pasando por el regulador de cuota como cualquier otra lectura.
+
+Rutas:
+    GET /disponibilidad           -> totales y lista de números disponibles
+    GET /disponibilidad/<numero>  -> si un número está disponible
+    GET /resumen                  -> totales y ventas/recaudación por vendedor
+
+Con varias rifas, ?rifa=<identificador> elige cuál (por defecto la primera). Si la
+rifa todavía no está cargada, o su lectura tiene más de MAX_STALE_SECONDS (Google
+Sheets no responde), se responde 503, nunca una lista vacía o vieja de ventas.
+
+Todas las respuestas llevan ETag y Age (segundos desde la última consulta a la hoja);
+con If-None-Match se responde 304 sin cuerpo.
+No se expone ningún dato de los compradores.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import rifa_datos
+
+# Antigüedad máxima de la lectura servida; pasado este tiempo sin poder actualizarla se responde 503
+MAX_STALE_SECONDS = 120
+
+# Una rifa sin pedidos durante este tiempo deja de actualizarse en segundo plano
+IDLE_REFRESH_SECONDS = 600
+
+def _encode(payload):
+    """Serializa una respuesta JSON a bytes"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _snapshot_etag(entry):
+    """Identifica la versión de la lectura: cambia con cada recarga o fila nueva"""
+    return f'"{int(entry["loaded_at"] * 1000):x}-{entry["rows"]}-{entry["revision"]}"'
+
+def build_payloads(entry, total_numbers=1000):
+    """Precalcula las respuestas de una versión de la lectura, para servirlas sin trabajo por pedido"""
+    states = rifa_datos.get_number_states(entry)
+    available = rifa_datos.get_available_numbers(states, total_numbers)
+    summary = rifa_datos.get_sales_summary(states)
+    per_vendor = rifa_datos.get_rollups(entry)['vendedor']
+    available_set = set(available)
+    return {
+        "etag": _snapshot_etag(entry),
+        "disponibles": available_set,
+        "/disponibilidad": _encode({
+            "total": total_numbers,
+            "disponibles": len(available),
+            "vendidos": summary['total_vendidos'],
+            "numeros_disponibles": available,
+        }),
+        "/resumen": _encode({
+            "total": total_numbers,
+            "disponibles": len(available),
+            "vendidos": summary['total_vendidos'],
+            "vendedores": {
+                vendedor: {"ventas": int(row['ventas']), "monto": float(row['monto'])}
+                for vendedor, row in per_vendor.iterrows()
+            },
+        }),
+    }
+
+class AvailabilityAPI:
+    """Mantiene las respuestas precalculadas de la última lectura de cada rifa"""
+
+    def __init__(self, raffles, worksheet_name="ventas", total_numbers=1000):
+        # Identificador -> configuración de la rifa (ver rifa_datos.raffle_config)
+        self.raffles = raffles
+        self.default = next(iter(raffles))
+        self.worksheet_name = worksheet_name
+        self.total_numbers = total_numbers
+        self._lock = threading.Lock()
+        self._payloads = {}
+        # Identificador -> último pedido, para saber qué rifas actualizar
+        self._requested = {}
+
+    def refresh(self, gc):
+        """Actualiza la lectura pública de las rifas consultadas hace poco
+
+        Una rifa pedida antes de estar cargada se carga aquí. Los errores (cuota agotada,
+        Google Sheets caído) se ignoran: se sigue sirviendo la última lectura hasta MAX_STALE_SECONDS.
+        """
+        now = time.time()
+        with self._lock:
+            slugs = [slug for slug, requested_at in self._requested.items() if now - requested_at < IDLE_REFRESH_SECONDS]
+        for slug in slugs:
+            raffle = self.raffles[slug]
+            try:
+                rifa_datos.get_snapshot(gc, raffle["sheet_id"], self.worksheet_name, rifa_datos.PUBLIC_COLUMNS,
+                                        raffle["particiones"])
+            except Exception:
+                pass
+
+    def run_refresher(self, gc, stop):
+        """Bucle del hilo de actualización: una lectura por rifa consultada cada PROBE_INTERVAL_SECONDS"""
+        while not stop.wait(rifa_datos.PROBE_INTERVAL_SECONDS):
+            self.refresh(gc)
+
+    def payloads(self, slug):
+        """Devuelve las respuestas de la lectura actual de la rifa y su antigüedad en segundos
+
+        Solo se recalculan si la lectura cambió. Las respuestas son None si la rifa
+        todavía no está cargada en memoria.
+        """
+        now = time.time()
+        with self._lock:
+            self._requested[slug] = now
+        raffle = self.raffles[slug]
+        sheet_id, shards = raffle["sheet_id"], raffle["particiones"]
+        entry = rifa_datos.cached_snapshot(sheet_id, self.worksheet_name, rifa_datos.PUBLIC_COLUMNS, shards)
+        if not entry["loaded_at"]:
+            # Nadie abrió aún una página pública: se usa la lectura completa si existe
+            entry = rifa_datos.cached_snapshot(sheet_id, self.worksheet_name, shards=shards)
+            if not entry["loaded_at"]:
+                # Rifa aún no cargada o descartada de la caché: se sueltan sus respuestas
+                with self._lock:
+                    self._payloads.pop(slug, None)
+                return None, None
+        etag = _snapshot_etag(entry)
+        payloads = self._payloads.get(slug)
+        if payloads is None or payloads["etag"] != etag:
+            with self._lock:
+                payloads = self._payloads.get(slug)
+                if payloads is None or payloads["etag"] != etag:
+                    payloads = self._payloads[slug] = build_payloads(entry, self.total_numbers)
+                    # Las respuestas de rifas que la caché ya descartó no se vuelven a servir
+                    cached = rifa_datos.cached_sheet_ids()
+                    for other in [other for other in self._payloads if self.raffles[other]["sheet_id"] not in cached]:
+                        del self._payloads[other]
+        return payloads, max(0.0, now - entry["probed_at"])
+
+def make_handler(api):
+    """Crea la clase de manejador HTTP ligada a una instancia de AvailabilityAPI"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Encabezados y cuerpo salen en un solo envío: sin esto, Nagle y el ACK
+        # retrasado agregan ~40 ms a cada respuesta en conexiones persistentes
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = url.path.rstrip("/")
+            slug = parse_qs(url.query).get("rifa", [api.default])[0]
+            if slug not in api.raffles:
+                return self._send(404, _encode({"error": "rifa no encontrada"}))
+            payloads, age = api.payloads(slug)
+            if payloads is None:
+                return self._send(503, _encode({"error": "datos aún no cargados"}))
+            if age > MAX_STALE_SECONDS:
+                return self._send(503, _encode({"error": "datos desactualizados"}))
+            if path in ("/disponibilidad", "/resumen"):
+                body = payloads[path]
+            elif path.startswith("/disponibilidad/"):
+                try:
+                    numero = int(path.rsplit("/", 1)[1])
+                except ValueError:
+                    return self._send(400, _encode({"error": "número inválido"}))
+                if not 1 <= numero <= api.total_numbers:
+                    return self._send(404, _encode({"error": "número fuera de rango"}))
+                body = _encode({"numero": numero, "disponible": numero in payloads["disponibles"]})
+            else:
+                return self._send(404, _encode({"error": "ruta no encontrada"}))
+
+            etag = payloads["etag"]
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", etag, age)
+            return self._send(200, body, etag, age)
+
+        def _send(self, status, body, etag=None, age=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 503:
+                # Se reintenta cuando el hilo de actualización ya pudo leer la hoja
+                self.send_header("Cache-Control", "no-store")
+                self.send_header("Retry-After", str(rifa_datos.PROBE_INTERVAL_SECONDS))
+            else:
+                self.send_header("Cache-Control", f"public, max-age={rifa_datos.PROBE_INTERVAL_SECONDS}")
+            if etag:
+                self.send_header("ETag", etag)
+            if age is not None:
+                self.send_header("Age", str(int(age)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Sin registro por pedido: a miles de pedidos por segundo el log domina el costo
+            pass
+
+    return Handler
+
+def start_server(raffles, port, host="0.0.0.0", worksheet_name="ventas", gc=None):
+    """Inicia la API de las rifas dadas en un hilo de fondo y devuelve el servidor
+
+    Con gc (cliente de Google Sheets) otro hilo mantiene actualizadas las rifas
+    consultadas; sin él se sirve lo que lea la aplicación.
+    """
+    api = AvailabilityAPI(raffles, worksheet_name)
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    server.api = api
+    server.stop_refresher = threading.Event()
+    threading.Thread(target=server.serve_forever, name="rifa-api", daemon=True).start()
+    if gc is not None:
+        threading.Thread(target=api.run_refresher, args=(gc, server.stop_refresher),
+                         name="rifa-api-actualizacion", daemon=True).start()
+    return server
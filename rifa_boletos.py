@@ -0,0 +1,183 @@
+"""Boletos de la rifa en PNG o PDF, de a uno o en lote
+
+Cada boleto lleva el número, el comprador, el vendedor, la fecha y un código de
+verificación: un HMAC de esos datos con una clave de la configuración, así que un
+boleto impreso no se puede falsificar cambiando el número o el nombre.
+
+El fondo fijo (encabezado, bordes y rótulos) se dibuja una sola vez por proceso y
+cada boleto solo agrega sus textos. Los lotes grandes se reparten en un pool de
+procesos y se escriben en el zip a medida que salen. El pool se crea una vez y se
+reutiliza: cada proceso nuevo vuelve a importar el script principal (en Streamlit,
+la aplicación entera), y eso cuesta segundos.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import io
+import multiprocessing
+import os
+import threading
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageDraw, ImageFont
+
+TITLE = "Rifa Multivendedor"
+TICKET_SIZE = (900, 420)
+FORMATS = {"png": "image/png", "pdf": "application/pdf"}
+
+# Campos del boleto: rótulo y altura en la mitad derecha
+FIELDS = {
+    "nombre_comprador": ("Comprador", 95),
+    "vendedor": ("Vendedor", 170),
+    "fecha": ("Fecha", 245),
+    "codigo": ("Código de verificación", 320),
+}
+FIELD_X = 360
+MAX_FIELD_CHARS = 30
+
+# Fuentes con acentos y eñe, por nombre de archivo (Pillow las busca en las carpetas del sistema).
+# RIFA_FUENTE permite indicar otra; la fuente incluida en Pillow no tiene esos caracteres.
+FONT_CANDIDATES = [os.environ.get("RIFA_FUENTE"), "DejaVuSans.ttf", "LiberationSans-Regular.ttf", "arial.ttf"]
+
+# Por debajo de esta cantidad arrancar procesos cuesta más de lo que ahorra
+POOL_THRESHOLD = 50
+# Boletos por tarea: menos viajes entre procesos
+CHUNK_SIZE = 25
+
+def ticket_secret(secrets):
+    """Clave de los códigos: BOLETOS_CLAVE de los secrets o, si falta, una derivada de la clave privada de la cuenta de servicio
+
+    Devuelve None si no hay ninguna configurada.
+    """
+    key = secrets.get("BOLETOS_CLAVE")
+    if key:
+        return str(key).encode("utf-8")
+    private_key = secrets.get("gcp_service_account", {}).get("private_key")
+    if not private_key:
+        return None
+    # Derivada y no la clave misma: el HMAC nunca usa el material de la cuenta de servicio directamente
+    return hmac.new(str(private_key).encode("utf-8"), b"rifa-boletos", hashlib.sha256).digest()
+
+def verification_code(sale, secret):
+    """Código de verificación de una venta, con la forma XXXX-XXXX"""
+    # Sin espacios de los bordes, igual que quedan los datos al leerlos de la hoja
+    message = "|".join(str(sale[field]).strip() for field in ("numero", "vendedor", "nombre_comprador", "fecha"))
+    digest = hmac.new(secret, message.encode("utf-8"), hashlib.sha256).digest()
+    code = base64.b32encode(digest[:5]).decode("ascii")
+    return f"{code[:4]}-{code[4:]}"
+
+def verify_code(sale, code, secret):
+    """Indica si el código impreso en un boleto corresponde a la venta"""
+    # En bytes: compare_digest no acepta textos con caracteres fuera de ASCII
+    return hmac.compare_digest(verification_code(sale, secret).encode("ascii"), code.strip().upper().encode("utf-8"))
+
+def ticket_filename(sale, fmt="png", digits=4):
+    return f"boleto_{int(sale['numero']):0{digits}d}.{fmt}"
+
+@functools.lru_cache(maxsize=None)
+def _font_path():
+    """Primera fuente disponible de FONT_CANDIDATES, o None si no hay ninguna"""
+    for candidate in filter(None, FONT_CANDIDATES):
+        try:
+            ImageFont.truetype(candidate, 10)
+            return candidate
+        except OSError:
+            continue
+    return None
+
+@functools.lru_cache(maxsize=None)
+def _font(size):
+    path = _font_path()
+    return ImageFont.truetype(path, size) if path else ImageFont.load_default(size=size)
+
+def _text(text):
+    """Sin una fuente con acentos, se quitan para no imprimir cuadraditos"""
+    if _font_path():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+@functools.lru_cache(maxsize=None)
+def _template():
+    """Fondo fijo del boleto, dibujado una vez por proceso"""
+    width, height = TICKET_SIZE
+    image = Image.new("RGB", TICKET_SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 60), fill="#667eea")
+    draw.text((30, 30), TITLE, font=_font(30), fill="white", anchor="lm")
+    draw.rectangle((0, 0, width - 1, height - 1), outline="#764ba2", width=4)
+    # Línea punteada entre el talón del número y los datos de la venta
+    for y in range(75, height - 15, 16):
+        draw.line((FIELD_X - 30, y, FIELD_X - 30, y + 8), fill="#999999", width=2)
+    draw.text((40, 85), _text("Número"), font=_font(22), fill="#666666")
+    for label, y in FIELDS.values():
+        draw.text((FIELD_X, y), _text(label), font=_font(18), fill="#666666")
+    return image
+
+def _fit(text):
+    return text if len(text) <= MAX_FIELD_CHARS else text[:MAX_FIELD_CHARS - 1] + "…"
+
+def render_ticket(sale, secret, fmt="png", digits=4):
+    """Dibuja el boleto de una venta y lo devuelve como bytes PNG o PDF"""
+    image = _template().copy()
+    draw = ImageDraw.Draw(image)
+    draw.text(((FIELD_X - 30) // 2, 250), f"{int(sale['numero']):0{digits}d}",
+              font=_font(110 if digits <= 4 else 80), fill="#333333", anchor="mm")
+    values = dict(sale, codigo=verification_code(sale, secret))
+    for field, (label, y) in FIELDS.items():
+        draw.text((FIELD_X, y + 24), _text(_fit(str(values[field]))), font=_font(30), fill="black")
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        image.save(buffer, "PDF", resolution=150)
+    else:
+        # Compresión mínima: importa más el tiempo que el tamaño
+        image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+def _render_chunk(chunk, secret, fmt, digits):
+    return [(ticket_filename(sale, fmt, digits), render_ticket(sale, secret, fmt, digits)) for sale in chunk]
+
+# Pools de procesos por cantidad de procesos pedida, vivos mientras viva el proceso
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(workers=None):
+    """Pool de procesos para dibujar lotes, creado la primera vez y reutilizado después"""
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn y no fork: el proceso de Streamlit tiene muchos hilos y fork los copiaría a medias
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+def write_tickets_zip(sales, secret, out, fmt="png", digits=4, workers=None):
+    """Escribe los boletos de las ventas en un zip (ruta o archivo abierto) a medida que se dibujan
+
+    Con POOL_THRESHOLD ventas o más se dibujan en paralelo en workers procesos
+    (por defecto uno por núcleo). Devuelve la cantidad de boletos escritos.
+    """
+    chunks = [sales[i:i + CHUNK_SIZE] for i in range(0, len(sales), CHUNK_SIZE)]
+    render = functools.partial(_render_chunk, secret=secret, fmt=fmt, digits=digits)
+    pool = _pool(workers) if len(sales) >= POOL_THRESHOLD else None
+    try:
+        results = pool.map(render, chunks) if pool else map(render, chunks)
+        # Sin compresión: PNG y PDF ya vienen comprimidos
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as archive:
+            for files in results:
+                for name, data in files:
+                    archive.writestr(name, data)
+    except BrokenProcessPool:
+        # Un proceso del pool murió: el próximo lote arranca uno nuevo
+        with _pools_lock:
+            if _pools.get(workers) is pool:
+                del _pools[workers]
+        raise
+    return len(sales)
+
+def tickets_zip_bytes(sales, secret, fmt="png", digits=4):
+    """Zip con los boletos en memoria, para ofrecerlo como descarga"""
+    buffer = io.BytesIO()
+    write_tickets_zip(sales, secret, buffer, fmt, digits)
+    return buffer.getvalue()
@@ -0,0 +1,252 @@
+"""Línea de comandos de la rifa, para reportes y operaciones masivas sin Streamlit
+
+Uso:
+    python rifa_cli.py resumen [--json]
+    python rifa_cli.py exportar [--salida ventas.csv]
+    python rifa_cli.py importar ventas.csv [--forzar]
+    python rifa_cli.py integridad
+    python rifa_cli.py sorteo [--semilla N]
+    python rifa_cli.py boletos [--formato png|pdf] [--vendedor V] [--numero N] [--salida boletos.zip]
+    python rifa_cli.py verificar NUMERO CODIGO
+
+Las credenciales se leen del mismo .streamlit/secrets.toml que usa la aplicación.
+Con varias rifas configuradas, --rifa elige cuál (por defecto la primera).
+Los módulos pesados (pandas, gspread) se importan solo al ejecutar un comando,
+para que la ayuda y los errores de uso respondan al instante.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+DEFAULT_SECRETS = ".streamlit/secrets.toml"
+
+def load_secrets(path):
+    """Lee el archivo de secrets de Streamlit; termina con un mensaje claro si no existe"""
+    if not os.path.isfile(path):
+        sys.exit(f"No se encontró el archivo de secrets {path} (ejecuta desde la carpeta de la aplicación o usa --secrets)")
+    try:
+        import tomllib
+    except ImportError:
+        # Python < 3.11: streamlit ya depende del paquete toml
+        import toml
+        with open(path, encoding="utf-8") as f:
+            return toml.load(f)
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def connect(args):
+    """Abre la conexión con Google Sheets a partir de los secrets
+
+    Devuelve el cliente, el ID de la hoja y la configuración de particiones de la rifa elegida.
+    """
+    import rifa_datos
+    secrets = load_secrets(args.secrets)
+    raffles = rifa_datos.raffle_config(secrets.get("rifas"), secrets.get("GOOGLE_SHEET_ID"), secrets.get("particiones"))
+    slug = args.rifa or next(iter(raffles), None)
+    if slug not in raffles and not args.sheet_id:
+        sys.exit(f"Rifa desconocida: {slug} (configuradas: {', '.join(raffles) or 'ninguna'})")
+    raffle = raffles.get(slug, {"sheet_id": None, "particiones": None})
+    if "gcp_service_account" not in secrets:
+        sys.exit(f"Falta la sección [gcp_service_account] en {args.secrets}")
+    gc = rifa_datos.connect(secrets["gcp_service_account"])
+    return gc, args.sheet_id or raffle["sheet_id"], raffle["particiones"]
+
+def number_states(gc, sheet_id, worksheet_name, shards):
+    """Lee la hoja y devuelve el estado actual de cada número"""
+    import rifa_datos
+    return rifa_datos.get_number_states(rifa_datos.get_snapshot(gc, sheet_id, worksheet_name, shards=shards))
+
+def cmd_resumen(args):
+    """Muestra el resumen de ventas"""
+    import rifa_datos
+    gc, sheet_id, shards = connect(args)
+    summary = rifa_datos.get_sales_summary(number_states(gc, sheet_id, args.hoja, shards))
+    if args.json:
+        summary['monto_total'] = float(summary['monto_total'])
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+    print(f"Números vendidos:    {summary['total_vendidos']}")
+    print(f"Números disponibles: {summary['total_disponibles']}")
+    print(f"Recaudación total:   ${summary['monto_total']:,.0f}")
+    for vendedor, ventas in sorted(summary['ventas_por_vendedor'].items(), key=lambda x: x[1], reverse=True):
+        print(f"  {vendedor}: {ventas} números")
+    return 0
+
+def cmd_exportar(args):
+    """Exporta todas las ventas a CSV"""
+    import rifa_datos
+    gc, sheet_id, shards = connect(args)
+    df = rifa_datos.get_sheet_data(gc, sheet_id, args.hoja, shards=shards)
+    if args.salida:
+        df.to_csv(args.salida, index=False)
+        print(f"{len(df)} filas exportadas a {args.salida}", file=sys.stderr)
+    else:
+        df.to_csv(sys.stdout, index=False)
+    return 0
+
+def cmd_importar(args):
+    """Importa ventas desde un CSV en una sola escritura"""
+    import pandas as pd
+    import rifa_datos
+    ventas = pd.read_csv(args.archivo, dtype=str, keep_default_na=False)
+    faltantes = {"vendedor", "numero", "nombre_comprador"} - set(ventas.columns)
+    if faltantes:
+        print(f"Faltan columnas obligatorias: {', '.join(sorted(faltantes))}", file=sys.stderr)
+        return 2
+
+    # Columnas opcionales con los mismos valores por defecto que la aplicación
+    ventas = ventas.reindex(columns=rifa_datos.SALE_COLUMNS, fill_value="")
+    ventas['fecha'] = ventas['fecha'].replace("", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    ventas['estado'] = ventas['estado'].replace("", "vendido")
+    ventas['observaciones'] = ventas['observaciones'].replace("", "Importación masiva")
+    # Número y monto se escriben como números, igual que desde el formulario
+    for column in ['numero', 'monto']:
+        converted = pd.to_numeric(ventas[column], errors='coerce')
+        ventas[column] = converted.astype(object).where(converted.notna(), ventas[column])
+
+    if not args.forzar:
+        # Mismo criterio que la revisión de integridad: se puede revender después de una cancelación
+        report = rifa_datos.integrity_report(ventas)
+        repetidos = report.loc[report['problema'] == rifa_datos.STATE_CONFLICTS['vendido'], 'numero']
+        if not repetidos.empty:
+            print(f"Números vendidos más de una vez en el archivo: {', '.join(map(str, sorted(set(repetidos.astype(int)))))} "
+                  "(usa --forzar para importarlos igual)", file=sys.stderr)
+            return 1
+
+    gc, sheet_id, shards = connect(args)
+    if not args.forzar and rifa_datos.discover_shards(rifa_datos.open_sheet(gc, sheet_id), args.hoja, shards):
+        vendidos = set(rifa_datos.get_sold_numbers(number_states(gc, sheet_id, args.hoja, shards)))
+        repetidos = sorted(set(rifa_datos.get_sold_numbers(rifa_datos.number_states(ventas))) & vendidos)
+        if repetidos:
+            print(f"Números ya vendidos: {', '.join(map(str, repetidos))} (usa --forzar para importarlos igual)", file=sys.stderr)
+            return 1
+
+    rifa_datos.append_sales(gc, sheet_id, ventas.to_dict('records'), args.hoja, shards)
+    print(f"{len(ventas)} ventas importadas")
+    return 0
+
+def cmd_integridad(args):
+    """Revisa conflictos de integridad; termina con código 1 si encuentra alguno"""
+    import rifa_datos
+    gc, sheet_id, shards = connect(args)
+    conflicts = rifa_datos.scan_integrity(rifa_datos.get_snapshot(gc, sheet_id, args.hoja, shards=shards))
+    if conflicts.empty:
+        print("No se detectaron conflictos en los datos")
+        return 0
+    print(conflicts.to_string(index=False))
+    return 1
+
+def cmd_sorteo(args):
+    """Sortea un número entre los vendidos"""
+    import random
+    import rifa_datos
+    gc, sheet_id, shards = connect(args)
+    ganador, winner_data = rifa_datos.draw_winner(number_states(gc, sheet_id, args.hoja, shards), random.Random(args.semilla))
+    if ganador is None:
+        print("No hay números vendidos para sortear", file=sys.stderr)
+        return 1
+    print(f"Número ganador: {ganador}")
+    print(f"Ganador: {winner_data['nombre_comprador']} - Tel: {winner_data['telefono']} - Vendedor: {winner_data['vendedor']}")
+    return 0
+
+def ticket_secret(args):
+    """Clave de los códigos de verificación de los boletos"""
+    import rifa_boletos
+    secret = rifa_boletos.ticket_secret(load_secrets(args.secrets))
+    if secret is None:
+        print("Falta BOLETOS_CLAVE en los secrets", file=sys.stderr)
+    return secret
+
+def cmd_boletos(args):
+    """Genera los boletos de las ventas: uno solo con --numero, o todos en un zip"""
+    import rifa_boletos
+    import rifa_datos
+    secret = ticket_secret(args)
+    if secret is None:
+        return 2
+    gc, sheet_id, shards = connect(args)
+    sales = rifa_datos.get_ticket_sales(number_states(gc, sheet_id, args.hoja, shards), args.vendedor)
+    if args.numero is not None:
+        sales = [sale for sale in sales if sale['numero'] == args.numero]
+        if not sales:
+            print(f"El número {args.numero} no está vendido", file=sys.stderr)
+            return 1
+        salida = args.salida or rifa_boletos.ticket_filename(sales[0], args.formato)
+        with open(salida, "wb") as f:
+            f.write(rifa_boletos.render_ticket(sales[0], secret, args.formato))
+        print(f"Boleto guardado en {salida}")
+        return 0
+    if not sales:
+        print("No hay números vendidos", file=sys.stderr)
+        return 1
+    salida = args.salida or "boletos.zip"
+    total = rifa_boletos.write_tickets_zip(sales, secret, salida, args.formato, workers=args.procesos)
+    print(f"{total} boletos guardados en {salida}")
+    return 0
+
+def cmd_verificar(args):
+    """Comprueba el código de verificación impreso en un boleto"""
+    import rifa_boletos
+    import rifa_datos
+    secret = ticket_secret(args)
+    if secret is None:
+        return 2
+    gc, sheet_id, shards = connect(args)
+    sales = rifa_datos.get_ticket_sales(number_states(gc, sheet_id, args.hoja, shards))
+    sale = next((sale for sale in sales if sale['numero'] == args.numero), None)
+    if sale is None or not rifa_boletos.verify_code(sale, args.codigo, secret):
+        print(f"El boleto {args.numero} con código {args.codigo} NO es válido")
+        return 1
+    print(f"Boleto válido: número {sale['numero']} - {sale['nombre_comprador']} - Vendedor: {sale['vendedor']}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rifa_cli", description="Reportes y operaciones de la Rifa Multivendedor")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS, help=f"archivo de secrets (por defecto {DEFAULT_SECRETS})")
+    parser.add_argument("--rifa", help="identificador de la rifa en [rifas] (por defecto la primera)")
+    parser.add_argument("--sheet-id", help="ID de la hoja de cálculo (por defecto el de la rifa elegida)")
+    parser.add_argument("--hoja", default="ventas", help="nombre de la hoja de ventas")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    resumen = subparsers.add_parser("resumen", help="resumen de ventas")
+    resumen.add_argument("--json", action="store_true", help="salida en formato JSON")
+    resumen.set_defaults(func=cmd_resumen)
+
+    exportar = subparsers.add_parser("exportar", help="exportar ventas a CSV")
+    exportar.add_argument("--salida", help="archivo de salida (por defecto la salida estándar)")
+    exportar.set_defaults(func=cmd_exportar)
+
+    importar = subparsers.add_parser("importar", help="importar ventas desde un CSV")
+    importar.add_argument("archivo", help="CSV con al menos las columnas vendedor, numero y nombre_comprador")
+    importar.add_argument("--forzar", action="store_true", help="importar aunque haya números ya vendidos")
+    importar.set_defaults(func=cmd_importar)
+
+    integridad = subparsers.add_parser("integridad", help="revisar conflictos de integridad")
+    integridad.set_defaults(func=cmd_integridad)
+
+    sorteo = subparsers.add_parser("sorteo", help="sortear un número entre los vendidos")
+    sorteo.add_argument("--semilla", type=int, help="semilla del sorteo, para poder repetirlo")
+    sorteo.set_defaults(func=cmd_sorteo)
+
+    boletos = subparsers.add_parser("boletos", help="generar boletos de los números vendidos")
+    boletos.add_argument("--formato", choices=["png", "pdf"], default="pdf", help="formato de cada boleto")
+    boletos.add_argument("--vendedor", help="solo los boletos de este vendedor")
+    boletos.add_argument("--numero", type=int, help="un solo boleto, en un archivo suelto")
+    boletos.add_argument("--salida", help="archivo de salida (por defecto boletos.zip)")
+    boletos.add_argument("--procesos", type=int, help="procesos en paralelo (por defecto uno por núcleo)")
+    boletos.set_defaults(func=cmd_boletos)
+
+    verificar = subparsers.add_parser("verificar", help="verificar el código de un boleto")
+    verificar.add_argument("numero", type=int, help="número del boleto")
+    verificar.add_argument("codigo", help="código de verificación impreso")
+    verificar.set_defaults(func=cmd_verificar)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Regulador de llamadas a Google Sheets con una cubeta de fichas compartida por el proceso
+
+Todas las sesiones de Streamlit comparten la cuota por minuto de la cuenta de servicio.
+En lugar de dejar que una ráfaga la agote y falle con un error 429, cada llamada
+espera su ficha en una cola donde las escrituras pasan antes que las lecturas.
+Las lecturas idénticas que coinciden en el tiempo se hacen una sola vez y comparten
+el resultado.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+# Prioridades en la cola: menor valor se atiende primero
+WRITE_PRIORITY = 0
+READ_PRIORITY = 1
+
+# Reintentos ante un 429 que se cuele igual (por ejemplo, otro proceso con la misma cuenta)
+MAX_RETRIES = 3
+
+def _is_rate_limited(error):
+    """Indica si el error de la API corresponde a cuota excedida"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+class RateGovernor:
+    """Cubeta de fichas con cola por prioridad y agrupación de lecturas idénticas"""
+
+    def __init__(self, requests_per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst or requests_per_minute)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._stats = {
+            "llamadas": 0,
+            "lecturas_agrupadas": 0,
+            "reintentos": 0,
+            "espera_total": 0.0,
+            "espera_maxima": 0.0,
+        }
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, write=False):
+        """Espera una ficha; las escrituras se atienden antes que las lecturas en espera"""
+        ticket = (WRITE_PRIORITY if write else READ_PRIORITY, next(self._sequence))
+        started = self._clock()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                self._refill()
+                at_head = self._queue[0] == ticket
+                if at_head and self._tokens >= 1:
+                    heapq.heappop(self._queue)
+                    self._tokens -= 1
+                    # El siguiente en la cola puede tener ya su ficha
+                    self._cond.notify_all()
+                    break
+                # Solo la cabeza de la cola sabe cuánto falta para la próxima ficha
+                self._cond.wait((1 - self._tokens) / self.rate if at_head else None)
+            waited = self._clock() - started
+            self._stats["llamadas"] += 1
+            self._stats["espera_total"] += waited
+            self._stats["espera_maxima"] = max(self._stats["espera_maxima"], waited)
+
+    def _run(self, func, args, kwargs, write):
+        for attempt in range(MAX_RETRIES + 1):
+            self.acquire(write)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == MAX_RETRIES:
+                    raise
+                with self._cond:
+                    self._stats["reintentos"] += 1
+                    # Se vacía la cubeta: la cuota real está agotada
+                    self._tokens = 0
+                self._sleep(2 ** attempt)
+
+    def call(self, func, *args, write=False, key=None, **kwargs):
+        """Ejecuta func con una ficha de la cubeta
+
+        Si key no es None y ya hay una lectura en curso con la misma clave, se espera
+        su resultado en lugar de repetirla.
+        """
+        if write or key is None:
+            return self._run(func, args, kwargs, write)
+
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats["lecturas_agrupadas"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._run(func, args, kwargs, write)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        """Métricas actuales de la cola y de la cubeta"""
+        with self._cond:
+            self._refill()
+            stats = dict(self._stats)
+            stats["escrituras_en_cola"] = sum(1 for priority, _ in self._queue if priority == WRITE_PRIORITY)
+            stats["lecturas_en_cola"] = len(self._queue) - stats["escrituras_en_cola"]
+            stats["lecturas_en_curso"] = len(self._inflight)
+            stats["fichas_disponibles"] = self._tokens
+            return stats
@@ -0,0 +1,1079 @@
+"""Capa de datos de la rifa: lectura y escritura en Google Sheets y cálculos sobre las ventas
+
+Este módulo no depende de Streamlit, para poder usarse tanto desde la aplicación
+como desde la línea de comandos (rifa_cli.py).
+"""
+import contextlib
+import datetime
+import functools
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import numpy as np
+import pandas as pd
+from google.oauth2.service_account import Credentials
+from gspread.utils import a1_range_to_grid_range, absolute_range_name, numericise_all, rowcol_to_a1
+
+import rifa_persistencia
+from rifa_cuota import RateGovernor
+
+# Permisos necesarios para leer y escribir la hoja de cálculo
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+def connect(service_account_info):
+    """Crea un cliente de gspread autorizado con la cuenta de servicio dada"""
+    credentials = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+    return gspread.authorize(credentials)
+
+# Columnas de la hoja de ventas, en el orden en que se escriben
+SALE_COLUMNS = ["fecha", "vendedor", "numero", "nombre_comprador", "telefono", "email", "monto", "estado", "observaciones"]
+
+# Columnas sin datos personales de los compradores, suficientes para las páginas públicas.
+# La fecha ordena los eventos de cada número: sin ella la vista particionada no sabría cuál es el último
+PUBLIC_COLUMNS = ("fecha", "numero", "estado", "vendedor", "monto")
+
+# Modos de partición de las ventas en varias hojas
+SHARD_MODES = ("rango", "vendedor")
+
+# Hilos para descargar las particiones en paralelo
+SHARD_FETCH_WORKERS = 8
+
+# Hoja auxiliar con el contador de revisión que incrementa cada escritura
+CONTROL_WORKSHEET = "control"
+
+# Segundos durante los cuales se sirve la copia en memoria sin consultar la revisión
+PROBE_INTERVAL_SECONDS = 10
+
+# Segundos tras los cuales se recarga todo, para recoger ediciones manuales en la hoja
+FULL_REFRESH_SECONDS = 300
+
+# Pedidos por minuto que admite Google Sheets para una misma cuenta de servicio
+SHEETS_REQUESTS_PER_MINUTE = 60
+
+# Regulador compartido por todas las llamadas del proceso a Google Sheets
+governor = RateGovernor(SHEETS_REQUESTS_PER_MINUTE)
+
+# Memoria (MB) y cantidad de rifas que la caché mantiene a la vez. Al pasarse se descartan
+# las rifas usadas hace más tiempo; vuelven a cargarse (desde la copia en disco si existe)
+# cuando alguien las pide. RIFA_MEMORIA_MB ajusta el presupuesto al contenedor.
+CACHE_MEMORY_BUDGET_MB = float(os.environ.get("RIFA_MEMORIA_MB", 256))
+MAX_CACHED_RAFFLES = 32
+
+def _read(target, method, *args, **kwargs):
+    """Lectura regulada; las lecturas idénticas simultáneas se hacen una sola vez"""
+    key = (getattr(target, "id", id(target)), method, repr(args), repr(kwargs))
+    return governor.call(getattr(target, method), *args, key=key, **kwargs)
+
+def _write(target, method, *args, **kwargs):
+    """Escritura regulada, atendida antes que las lecturas en espera"""
+    return governor.call(getattr(target, method), *args, write=True, **kwargs)
+
+# Caché compartida por todo el proceso con la última lectura de cada hoja.
+# En Streamlit los módulos importados sobreviven a las re-ejecuciones del script,
+# así que esta caché es común a todas las sesiones. Cada entrada tiene su propio
+# candado de carga: sesiones que piden lo mismo esperan una sola descarga.
+_snapshot_cache = {"lock": threading.Lock(), "sheets": {}, "entries": {}, "load_locks": {}}
+
+def get_snapshot_cache():
+    """Caché compartida entre sesiones con la última lectura de cada hoja"""
+    return _snapshot_cache
+
+def open_sheet(gc, sheet_id):
+    """Devuelve la hoja de cálculo abierta, reutilizando la de lecturas anteriores"""
+    sheets = get_snapshot_cache()["sheets"]
+    if sheet_id not in sheets:
+        sheets[sheet_id] = governor.call(gc.open_by_key, sheet_id, key=("open_by_key", sheet_id))
+    return sheets[sheet_id]
+
+def get_revision(sheet):
+    """Lee el contador de revisión de la hoja de control (una sola celda)"""
+    try:
+        result = _read(sheet, "values_get", absolute_range_name(CONTROL_WORKSHEET, "B1"))
+    except gspread.exceptions.APIError as e:
+        # 400 ("Unable to parse range"): la hoja de control aún no existe, nadie ha escrito
+        # desde la app. Cuota agotada o fallas del servidor se propagan: tomarlas como
+        # "sin revisión" forzaría otra lectura justo cuando no quedan pedidos
+        if getattr(e.response, "status_code", None) != 400:
+            raise
+        return None
+    values = result.get("values", [])
+    return values[0][0] if values and values[0] else None
+
+def bump_revision(sheet):
+    """Incrementa el contador de revisión, creando la hoja de control si hace falta"""
+    try:
+        control = _read(sheet, "worksheet", CONTROL_WORKSHEET)
+    except gspread.WorksheetNotFound:
+        control = _write(sheet, "add_worksheet", title=CONTROL_WORKSHEET, rows=1, cols=2)
+        _write(control, "update_acell", "A1", "revision")
+    # Parte de una escritura: con su prioridad y sin agruparse con otras lecturas
+    current = governor.call(control.acell, "B1", write=True).value
+    _write(control, "update_acell", "B1", int(current or 0) + 1)
+
+def _rows_to_frame(header, rows):
+    """Convierte filas crudas de la hoja en DataFrame, igual que get_all_records"""
+    records = []
+    for row in rows:
+        row = list(row) + [""] * (len(header) - len(row))
+        records.append(dict(zip(header, numericise_all(row[:len(header)]))))
+    return pd.DataFrame(records, columns=header)
+
+def _read_header(sheet, worksheet_name):
+    """Lee la fila de encabezados de la hoja"""
+    values = _read(sheet, "values_get", absolute_range_name(worksheet_name, "1:1")).get("values", [])
+    return values[0] if values else []
+
+def _fetch_columns(sheet, worksheet_name, header, columns, start):
+    """Descarga solo las columnas pedidas, desde la fila start, en un único pedido
+
+    Devuelve el DataFrame y la cantidad de filas leídas.
+    """
+    present = [column for column in columns if column in header]
+    if not present:
+        return pd.DataFrame(columns=present), 0
+    ranges = []
+    for column in present:
+        letter = rowcol_to_a1(1, header.index(column) + 1).rstrip("0123456789")
+        ranges.append(absolute_range_name(worksheet_name, f"{letter}{start}:{letter}"))
+    # Por columnas: cada rango llega como una sola lista, sin filas intermedias
+    result = _read(sheet, "values_batch_get", ranges, params={"majorDimension": "COLUMNS"})
+    data = [(value_range.get("values") or [[]])[0] for value_range in result.get("valueRanges", [])]
+    # La API recorta las celdas vacías del final de cada columna
+    n = max(len(values) for values in data)
+    frame = pd.DataFrame(
+        {column: numericise_all(list(values) + [""] * (n - len(values))) for column, values in zip(present, data)},
+        columns=present
+    )
+    return frame, n
+
+def _full_fetch(sheet, worksheet_name, columns=None):
+    """Descarga la hoja (o solo las columnas pedidas) y arma una nueva entrada de caché"""
+    # La revisión se lee antes que los datos para no perder escrituras concurrentes
+    revision = get_revision(sheet)
+    if columns is None:
+        values = _read(sheet, "values_get", absolute_range_name(worksheet_name)).get("values", [])
+        if not values:
+            # Misma semántica que get_all_records sobre una hoja vacía
+            header, rows = [], []
+        else:
+            header, rows = values[0], values[1:]
+        df, n = _rows_to_frame(header, rows), len(rows)
+    else:
+        header = _read_header(sheet, worksheet_name)
+        df, n = _fetch_columns(sheet, worksheet_name, header, columns, 2)
+    now = time.time()
+    return {
+        "df": df,
+        "header": header or SALE_COLUMNS,
+        "worksheet": worksheet_name,
+        "columns": columns,
+        "rows": n,
+        "revision": revision,
+        "loaded_at": now,
+        "probed_at": now,
+        "lock": threading.RLock(),
+    }
+
+def _delta_fetch(sheet, worksheet_name, entry, revision):
+    """Descarga solo las filas agregadas después de la última lectura"""
+    # Fila 1 = encabezados; la primera fila nueva es rows + 2
+    start = entry["rows"] + 2
+    if entry["columns"] is None:
+        rows = _read(sheet, "values_get", absolute_range_name(worksheet_name, f"A{start}:ZZ")).get("values", [])
+        new_df, n = _rows_to_frame(entry["header"], rows), len(rows)
+    else:
+        new_df, n = _fetch_columns(sheet, worksheet_name, entry["header"], entry["columns"], start)
+    if n:
+        entry["df"] = pd.concat([entry["df"], new_df], ignore_index=True) if not entry["df"].empty else new_df
+        entry["rows"] += n
+    entry["revision"] = revision
+    return entry
+
+def _empty_entry():
+    """Entrada vacía para cuando no hay lectura previa disponible"""
+    return {"df": pd.DataFrame(), "header": SALE_COLUMNS, "worksheet": None, "columns": None, "rows": 0,
+            "revision": None, "loaded_at": 0, "probed_at": 0, "lock": threading.RLock()}
+
+def shard_spec(config):
+    """Normaliza la configuración de particiones (sección [particiones] de los secrets)
+
+    Ejemplo en secrets.toml:
+
+        [particiones]
+        modo = "rango"   # o "vendedor"
+        tamano = 1000    # números por hoja, solo en modo rango
+
+    Devuelve None si no hay particiones configuradas.
+    """
+    if not config:
+        return None
+    modo = config.get('modo', 'rango')
+    if modo not in SHARD_MODES:
+        raise ValueError(f"Modo de partición desconocido: {modo}")
+    return {'modo': modo, 'tamano': int(config.get('tamano', 1000))}
+
+def raffle_config(config, sheet_id=None, shards=None):
+    """Normaliza las rifas servidas por la aplicación (sección [rifas] de los secrets)
+
+    Ejemplo en secrets.toml:
+
+        [rifas.navidad]
+        nombre = "Rifa de Navidad"
+        sheet_id = "1AbC..."
+
+        [rifas.escuela]
+        nombre = "Rifa de la Escuela"
+        sheet_id = "1XyZ..."
+        particiones = { modo = "rango", tamano = 1000 }
+
+    Sin sección [rifas] hay una sola, con la hoja y las particiones dadas (GOOGLE_SHEET_ID
+    y [particiones]). Devuelve un dict identificador -> {nombre, sheet_id, particiones},
+    en el orden de la configuración; la primera es la rifa por defecto.
+    """
+    if not config:
+        if not sheet_id:
+            return {}
+        return {"principal": {"nombre": "Rifa", "sheet_id": str(sheet_id), "particiones": shard_spec(shards)}}
+    return {
+        str(slug): {
+            "nombre": str(raffle.get("nombre", slug)),
+            "sheet_id": str(raffle["sheet_id"]),
+            "particiones": shard_spec(raffle.get("particiones")),
+        }
+        for slug, raffle in config.items()
+    }
+
+def shard_for(sale_data, shards, worksheet_name="ventas"):
+    """Nombre de la hoja donde se guarda una venta según la partición"""
+    if shards['modo'] == 'rango':
+        try:
+            numero = int(sale_data["numero"])
+        except (TypeError, ValueError):
+            return f"{worksheet_name}_otros"
+        return f"{worksheet_name}_{(numero - 1) // shards['tamano'] + 1}"
+    return f"{worksheet_name}_{_seller_suffix(sale_data['vendedor'])}"
+
+def _seller_suffix(vendedor):
+    """Sufijo de la hoja de un vendedor
+
+    Los títulos de hoja admiten casi todo, pero se normalizan para evitar duplicados por mayúsculas o espacios.
+    """
+    return re.sub(r"\W+", "_", str(vendedor).strip().upper()).strip("_")[:60] or "otros"
+
+def _is_shard(suffix, shards):
+    """Indica si el sufijo de una hoja "ventas_*" es uno que shard_for puede generar
+
+    Así una hoja auxiliar (ventas_backup, ventas_copia) no se suma a las ventas.
+    """
+    if suffix == "otros":
+        return True
+    if shards['modo'] == 'rango':
+        return suffix.isdigit()
+    return _seller_suffix(suffix) == suffix
+
+def _shard_order(title):
+    """Orden natural de las particiones: las numéricas por número, el resto alfabético"""
+    suffix = title.rsplit("_", 1)[-1]
+    return (0, int(suffix), "") if suffix.isdigit() else (1, 0, suffix)
+
+def discover_shards(sheet, worksheet_name="ventas", shards=None):
+    """Lista las hojas de ventas: la hoja base (si existe, con datos anteriores a particionar) y sus particiones
+
+    Sin shards no hay particiones: solo se busca la hoja base.
+    """
+    titles = [ws.title for ws in governor.call(sheet.worksheets, key=(sheet.id, "worksheets"))]
+    prefix = f"{worksheet_name}_"
+    found = sorted(
+        (t for t in titles if shards and t.startswith(prefix) and _is_shard(t[len(prefix):], shards)),
+        key=_shard_order
+    )
+    return ([worksheet_name] if worksheet_name in titles else []) + found
+
+def _entry_key(sheet_id, worksheet_name, columns, shards=None):
+    """Clave de caché: cada proyección de columnas (y vista particionada) se guarda por separado"""
+    return (sheet_id, worksheet_name, tuple(columns) if columns is not None else None,
+            tuple(sorted(shards.items())) if shards else None)
+
+@contextlib.contextmanager
+def _load_lock(key):
+    """Toma el candado de carga de una entrada
+
+    Si mientras se esperaba el candado la rifa se descartó de la caché (y con ella su
+    candado), se toma el nuevo: nunca hay dos cargas de la misma entrada a la vez.
+    """
+    cache = get_snapshot_cache()
+    while True:
+        with cache["lock"]:
+            lock = cache["load_locks"].setdefault(key, threading.Lock())
+        with lock:
+            with cache["lock"]:
+                current = cache["load_locks"].get(key) is lock
+            if current:
+                yield
+                return
+
+def _store_entry(key, entry):
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        cache["entries"][key] = entry
+    _evict(keep=key[0])
+
+def _entry_bytes(entry):
+    """Memoria aproximada de una entrada (datos crudos y tipados), midiendo solo las filas nuevas
+
+    Las entradas solo crecen; una recarga completa crea una entrada nueva y se mide de cero.
+    """
+    rows, typed_rows, size = entry.get("bytes", (0, 0, 0))
+    if rows < entry["rows"]:
+        size += int(entry["df"].iloc[rows:].memory_usage(deep=True).sum())
+        rows = entry["rows"]
+    typed = entry.get("typed")
+    if typed is not None and typed_rows < len(typed):
+        size += int(typed.iloc[typed_rows:].memory_usage(deep=True).sum())
+        typed_rows = len(typed)
+    entry["bytes"] = (rows, typed_rows, size)
+    return size
+
+def _raffle_usage(entries):
+    """Último uso y memoria de cada rifa (hoja de cálculo) en la caché"""
+    usage = {}
+    for key, entry in entries.items():
+        used_at, size = usage.get(key[0], (0, 0))
+        usage[key[0]] = (max(used_at, entry.get("used_at", entry["loaded_at"])), size + _entry_bytes(entry))
+    return usage
+
+def _evict(keep):
+    """Descarta las rifas usadas hace más tiempo mientras se pase el presupuesto de memoria o de rifas
+
+    Una rifa con alguna lectura o escritura en curso (candado de carga tomado) no se
+    descarta: se pasa a la siguiente. Los candados no se esperan, así dos hilos que
+    guardan entradas de rifas distintas no pueden bloquearse entre sí.
+    """
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        usage = _raffle_usage(cache["entries"])
+    total = sum(size for _, size in usage.values())
+    count = len(usage)
+    for sheet_id, (_, size) in sorted(usage.items(), key=lambda item: item[1][0]):
+        if total <= CACHE_MEMORY_BUDGET_MB * 2**20 and count <= MAX_CACHED_RAFFLES:
+            break
+        if sheet_id != keep and _evict_raffle(sheet_id):
+            total -= size
+            count -= 1
+
+def _evict_raffle(sheet_id):
+    """Quita de la caché todas las entradas de una rifa; devuelve False si está en uso"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        keys = [key for key in cache["entries"] if key[0] == sheet_id]
+        locks = [cache["load_locks"].setdefault(key, threading.Lock()) for key in keys]
+    held = []
+    try:
+        for lock in locks:
+            if not lock.acquire(blocking=False):
+                return False
+            held.append(lock)
+        with cache["lock"]:
+            entries = {key: cache["entries"].pop(key, None) for key in keys}
+            for key in keys:
+                cache["load_locks"].pop(key, None)
+            cache["sheets"].pop(sheet_id, None)
+        for key, entry in entries.items():
+            if entry is not None and key[3] is None:
+                # Con el candado tomado la marca de agua coincide con las filas guardadas;
+                # al volver se arranca desde el disco y solo se descarga lo nuevo
+                rifa_persistencia.save_entry(key, entry, force=True)
+        return True
+    finally:
+        for lock in held:
+            lock.release()
+
+def cached_sheet_ids():
+    """Hojas de cálculo (rifas) con alguna lectura en la caché"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        return {key[0] for key in cache["entries"]}
+
+def cache_stats():
+    """Rifas en memoria y memoria aproximada que ocupan, para el panel de administración"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        usage = _raffle_usage(cache["entries"])
+    return {
+        "rifas": len(usage),
+        "memoria_mb": sum(size for _, size in usage.values()) / 2**20,
+        "presupuesto_mb": CACHE_MEMORY_BUDGET_MB,
+    }
+
+def _warm_entry(sheet, key, worksheet_name, revision=None):
+    """Arranca desde la copia en disco (si existe) descargando solo las filas posteriores a su marca"""
+    stored = rifa_persistencia.load_entry(key)
+    if stored is None:
+        return None
+    df, metadata = stored
+    now = time.time()
+    entry = {
+        "df": df,
+        "header": metadata["header"],
+        "worksheet": worksheet_name,
+        "columns": tuple(metadata["columns"]) if metadata["columns"] is not None else None,
+        "rows": metadata["rows"],
+        "revision": metadata["revision"],
+        "loaded_at": now,
+        "probed_at": now,
+        "lock": threading.RLock(),
+    }
+    # Siempre se pide el delta: pudo haber filas agregadas a mano sin cambiar la revisión
+    return _delta_fetch(sheet, worksheet_name, entry, get_revision(sheet) if revision is None else revision)
+
+def _refresh_entry(sheet, sheet_id, worksheet_name, columns, revision=None):
+    """Actualiza la entrada de una hoja; con revision dada no vuelve a consultarla"""
+    key = _entry_key(sheet_id, worksheet_name, columns)
+    with _load_lock(key):
+        entry = get_snapshot_cache()["entries"].get(key)
+        now = time.time()
+        if entry is None:
+            entry = _warm_entry(sheet, key, worksheet_name, revision)
+            if entry is not None:
+                _store_entry(key, entry)
+                rifa_persistencia.save_entry(key, entry)
+                return entry
+        if entry is None or now - entry["loaded_at"] >= FULL_REFRESH_SECONDS:
+            entry = _full_fetch(sheet, worksheet_name, columns)
+            rifa_persistencia.save_entry(key, entry, force=True)
+        else:
+            if revision is None:
+                revision = get_revision(sheet)
+            if revision != entry["revision"]:
+                rows_before = entry["rows"]
+                entry = _delta_fetch(sheet, worksheet_name, entry, revision)
+                if entry["rows"] != rows_before:
+                    rifa_persistencia.save_entry(key, entry)
+            entry["probed_at"] = now
+        _store_entry(key, entry)
+        return entry
+
+def _shard_rows(entry, start=0):
+    """Filas nuevas de una partición, con la hoja y la fila de origen"""
+    rows = entry["df"].iloc[start:].copy()
+    rows.insert(0, "hoja", entry["worksheet"])
+    # Fila real en la hoja: posición más el encabezado
+    rows.insert(1, "fila", range(start + 2, start + 2 + len(rows)))
+    return rows
+
+def _merge_shards(merged, shard_entries, revision):
+    """Une las particiones en una vista que solo crece, para que los derivados sigan siendo incrementales
+
+    Si alguna partición se recargó completa o cambió el conjunto de hojas, la vista se rehace.
+    """
+    now = time.time()
+    names = list(shard_entries)
+    rebuild = (
+        merged is None
+        or names != merged["shards"]
+        or any(shard_entries[n]["loaded_at"] != merged["shard_loaded"][n] for n in names)
+    )
+    if rebuild:
+        frames = [_shard_rows(shard_entries[n]) for n in names]
+        merged = {
+            "df": pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(),
+            "header": SALE_COLUMNS,
+            "worksheet": None,
+            "columns": None,
+            "rows": 0,
+            "revision": revision,
+            "loaded_at": now,
+            "probed_at": now,
+            "lock": threading.RLock(),
+            "shards": names,
+            "shard_loaded": {n: shard_entries[n]["loaded_at"] for n in names},
+            "shard_rows": {n: shard_entries[n]["rows"] for n in names},
+        }
+        merged["rows"] = len(merged["df"])
+        return merged
+
+    frames = [_shard_rows(shard_entries[n], merged["shard_rows"][n])
+              for n in names if shard_entries[n]["rows"] > merged["shard_rows"][n]]
+    if frames:
+        merged["df"] = pd.concat([merged["df"]] + frames, ignore_index=True)
+        merged["rows"] = len(merged["df"])
+        merged["shard_rows"] = {n: shard_entries[n]["rows"] for n in names}
+    merged["revision"] = revision
+    merged["probed_at"] = now
+    return merged
+
+def _sharded_snapshot(gc, sheet_id, worksheet_name, columns, shards):
+    """Vista unificada de todas las particiones, descargadas en paralelo"""
+    key = _entry_key(sheet_id, worksheet_name, columns, shards)
+    with _load_lock(key):
+        merged = get_snapshot_cache()["entries"].get(key)
+        now = time.time()
+        if merged is not None and now - merged["probed_at"] < PROBE_INTERVAL_SECONDS:
+            return merged
+        sheet = open_sheet(gc, sheet_id)
+        revision = get_revision(sheet)
+        full_due = merged is None or now - merged["loaded_at"] >= FULL_REFRESH_SECONDS
+        if not full_due and revision == merged["revision"]:
+            merged["probed_at"] = now
+            return merged
+        # Solo hay hojas nuevas si hubo escrituras: se vuelven a listar al cambiar la revisión
+        names = discover_shards(sheet, worksheet_name, shards)
+        with ThreadPoolExecutor(max_workers=max(1, min(SHARD_FETCH_WORKERS, len(names)))) as pool:
+            entries = list(pool.map(lambda name: _refresh_entry(sheet, sheet_id, name, columns, revision), names))
+        merged = _merge_shards(merged, dict(zip(names, entries)), revision)
+        _store_entry(key, merged)
+        return merged
+
+def get_snapshot(gc, sheet_id, worksheet_name="ventas", columns=None, shards=None):
+    """Obtiene la entrada de caché de la hoja, con los datos y sus derivados
+
+    Con columns se descargan solo esas columnas (por ejemplo PUBLIC_COLUMNS, sin datos
+    de compradores); None trae la hoja completa. Con shards (ver shard_spec) se leen
+    todas las particiones en paralelo y se unen en un solo DataFrame.
+
+    Se sirve la copia en memoria mientras sea reciente; pasado PROBE_INTERVAL_SECONDS
+    se consulta solo la celda de revisión y se descargan las filas nuevas si cambió.
+    Los errores de la API se propagan; cached_snapshot devuelve la última lectura válida.
+    """
+    if shards:
+        entry = _sharded_snapshot(gc, sheet_id, worksheet_name, columns, shards)
+    else:
+        entry = get_snapshot_cache()["entries"].get(_entry_key(sheet_id, worksheet_name, columns))
+        if entry is None or time.time() - entry["probed_at"] >= PROBE_INTERVAL_SECONDS:
+            entry = _refresh_entry(open_sheet(gc, sheet_id), sheet_id, worksheet_name, columns)
+    # Para el descarte por antigüedad de uso (_evict)
+    entry["used_at"] = time.time()
+    return entry
+
+def cached_snapshot(sheet_id, worksheet_name="ventas", columns=None, shards=None):
+    """Devuelve la última lectura guardada de la hoja, o una vacía si no hay ninguna"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(_entry_key(sheet_id, worksheet_name, columns, shards))
+    if entry is None:
+        return _empty_entry()
+    entry["used_at"] = time.time()
+    return entry
+
+def get_sheet_data(gc, sheet_id, worksheet_name="ventas", columns=None, shards=None):
+    """Obtiene datos de la hoja de cálculo"""
+    return get_snapshot(gc, sheet_id, worksheet_name, columns, shards)["df"]
+
+def invalidate_sheet_data(sheet_id, worksheet_name="ventas"):
+    """Fuerza a que la próxima lectura (de cualquier proyección o partición) consulte la revisión sin esperar el intervalo"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        for key, entry in cache["entries"].items():
+            if key[0] == sheet_id and (key[1] == worksheet_name or key[1].startswith(f"{worksheet_name}_")):
+                entry["probed_at"] = 0
+
+def sale_to_row(sale_data):
+    """Convierte una venta en la fila que se escribe en la hoja"""
+    return [
+        sale_data["fecha"],
+        sale_data["vendedor"],
+        sale_data["numero"],
+        sale_data["nombre_comprador"],
+        sale_data["telefono"],
+        sale_data["email"],
+        sale_data["monto"],
+        sale_data["estado"],
+        sale_data.get("observaciones", "")
+    ]
+
+def _open_or_create_worksheet(sheet, worksheet_name, rows=1000):
+    """Abre la hoja de ventas, creándola con encabezados si no existe"""
+    try:
+        return _read(sheet, "worksheet", worksheet_name)
+    except gspread.WorksheetNotFound:
+        # Crear hoja con headers
+        worksheet = _write(sheet, "add_worksheet", title=worksheet_name, rows=rows, cols=len(SALE_COLUMNS) + 1)
+        _write(worksheet, "append_row", SALE_COLUMNS)
+        return worksheet
+
+def _appended_start(response):
+    """Primera fila escrita por append_rows, según el rango que informa la API"""
+    try:
+        updated = response["updates"]["updatedRange"]
+    except (TypeError, KeyError):
+        return None
+    return a1_range_to_grid_range(updated.rsplit("!", 1)[-1])["startRowIndex"] + 1
+
+def _apply_appended(sheet_id, worksheet_name, start, rows):
+    """Agrega en memoria las filas recién escritas a las lecturas de esa hoja, sin volver a descargarlas
+
+    Solo si quedaron justo después de lo ya leído; si otra sesión escribió en el medio
+    se devuelve False. La revisión guardada no se toca: la próxima consulta verá que
+    cambió y traerá desde la nueva marca lo que hayan escrito otros.
+    """
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        keys = [key for key in cache["entries"] if key[:2] == (sheet_id, worksheet_name) and key[3] is None]
+    # Como texto, igual que los valores que devuelve la API al leer la hoja
+    rows = [[str(value) for value in row] for row in rows]
+    applied = True
+    for key in keys:
+        with _load_lock(key):
+            # La rifa pudo descartarse de la caché mientras tanto: no hay nada que actualizar
+            entry = cache["entries"].get(key)
+            if entry is None or start is None or start != entry["rows"] + 2:
+                applied = False
+                continue
+            new_df = _rows_to_frame(entry["header"], rows)
+            if entry["columns"] is not None:
+                new_df = new_df[[column for column in entry["columns"] if column in entry["header"]]]
+            entry["df"] = pd.concat([entry["df"], new_df], ignore_index=True) if not entry["df"].empty else new_df
+            entry["rows"] += len(rows)
+            rifa_persistencia.save_entry(key, entry)
+    return applied
+
+def _remerge_shards(sheet_id, worksheet_name, targets):
+    """Actualiza las vistas particionadas con las filas ya agregadas a cada partición"""
+    cache = get_snapshot_cache()
+    with cache["lock"]:
+        keys = [key for key in cache["entries"] if key[:2] == (sheet_id, worksheet_name) and key[3] is not None]
+    applied = True
+    for key in keys:
+        with _load_lock(key):
+            merged = cache["entries"].get(key)
+            if merged is None:
+                applied = False
+                continue
+            names = merged.get("shards", [])
+            shard_entries = {name: cache["entries"].get(_entry_key(sheet_id, name, key[2])) for name in names}
+            if not set(targets) <= set(names) or any(entry is None for entry in shard_entries.values()):
+                # Partición nueva o sin lectura propia: se descubre en la próxima consulta
+                applied = False
+                continue
+            probed_at = merged["probed_at"]
+            merged = _merge_shards(merged, shard_entries, merged["revision"])
+            merged["probed_at"] = probed_at
+            _store_entry(key, merged)
+    return applied
+
+def append_sales(gc, sheet_id, sales, worksheet_name="ventas", shards=None):
+    """Agrega ventas a la hoja de cálculo, con una escritura por hoja (o partición) afectada
+
+    Las filas escritas se agregan también a las lecturas en memoria, así la página
+    que sigue a una venta no espera otra descarga.
+    """
+    sheet = open_sheet(gc, sheet_id)
+    
+    groups = {}
+    for sale in sales:
+        target = shard_for(sale, shards, worksheet_name) if shards else worksheet_name
+        groups.setdefault(target, []).append(sale_to_row(sale))
+    
+    applied = True
+    for target, rows in groups.items():
+        # En modo rango cada partición tiene a lo sumo "tamano" números (más algún reintento)
+        size = shards['tamano'] + 1 if shards and shards['modo'] == 'rango' else 1000
+        worksheet = _open_or_create_worksheet(sheet, target, rows=size)
+        response = _write(worksheet, "append_rows", rows)
+        applied = _apply_appended(sheet_id, target, _appended_start(response), rows) and applied
+    bump_revision(sheet)
+    if shards:
+        applied = _remerge_shards(sheet_id, worksheet_name, groups) and applied
+    if not applied:
+        invalidate_sheet_data(sheet_id, worksheet_name)
+
+def add_sale_to_sheet(gc, sheet_id, sale_data, worksheet_name="ventas", shards=None):
+    """Agrega una nueva venta a la hoja de cálculo"""
+    append_sales(gc, sheet_id, [sale_data], worksheet_name, shards)
+
+def _with_entry_lock(func):
+    """Serializa el cálculo de derivados de una misma entrada entre hilos (sesiones, API)"""
+    @functools.wraps(func)
+    def wrapper(entry, *args, **kwargs):
+        with entry["lock"]:
+            return func(entry, *args, **kwargs)
+    return wrapper
+
+def parse_dates(values):
+    """Convierte fechas de la hoja a datetime, aceptando las escritas a mano
+
+    La aplicación escribe "%Y-%m-%d %H:%M:%S"; una fecha tipeada en la hoja vuelve en el
+    formato regional, que en español lleva el día primero (1/1/2026 11:00:00).
+    """
+    fecha = pd.to_datetime(values, format="%Y-%m-%d %H:%M:%S", errors='coerce')
+    pending = fecha.isna() & (values.astype(str).str.strip() != "") & values.notna()
+    if pending.any():
+        text = values[pending].astype(str).str.strip()
+        # Primero ISO sin hora u otra precisión (así 2026-01-02 no se lee como 1 de febrero), después día primero
+        parsed = pd.to_datetime(text, format="ISO8601", errors='coerce')
+        missing = parsed.isna()
+        if missing.any():
+            parsed[missing] = pd.to_datetime(text[missing], format="mixed", dayfirst=True, errors='coerce')
+        fecha[pending] = parsed
+    return fecha
+
+def _order_dates(typed, previous=None):
+    """Fecha con la que se ordena cada evento: la propia o, si no es válida, la de la fila anterior de su hoja
+
+    Así una fila con fecha ilegible conserva su lugar dentro de su hoja en vez de pasar a
+    ser el evento más antiguo. previous son las filas ya tipadas de la misma lectura.
+    """
+    sheets = typed['hoja'] if 'hoja' in typed.columns else pd.Series("", index=typed.index)
+    orden = typed['fecha'].groupby(sheets).ffill()
+    if previous is not None and not previous.empty and orden.isna().any():
+        previous_sheets = previous['hoja'] if 'hoja' in previous.columns else pd.Series("", index=previous.index)
+        orden = orden.fillna(sheets.map(previous['orden'].groupby(previous_sheets).last()))
+    return orden
+
+def to_typed_frame(df, previous=None):
+    """Convierte las columnas de ventas a tipos utilizables sin fallar ante valores inválidos
+
+    previous son las filas ya tipadas que preceden a df, para continuar el orden de los eventos.
+    """
+    typed = df.reindex(columns=SALE_COLUMNS if df.empty else df.columns.union(SALE_COLUMNS, sort=False))
+    numero = pd.to_numeric(typed['numero'], errors='coerce')
+    # Los números con decimales tampoco son válidos
+    typed['numero'] = numero.where(numero == numero.round()).astype('Int64')
+    typed['monto'] = pd.to_numeric(typed['monto'], errors='coerce').astype(float)
+    typed['fecha'] = parse_dates(typed['fecha'])
+    for column in ['vendedor', 'nombre_comprador', 'telefono', 'email', 'estado', 'observaciones']:
+        typed[column] = typed[column].fillna("").astype(str).str.strip()
+    typed['orden'] = _order_dates(typed, previous)
+    return typed
+
+@_with_entry_lock
+def get_typed_frame(entry):
+    """Devuelve el DataFrame tipado de la entrada, convirtiendo solo las filas nuevas"""
+    typed = entry.get("typed")
+    done = 0 if typed is None else len(typed)
+    if done < entry["rows"]:
+        new_typed = to_typed_frame(entry["df"].iloc[done:], typed)
+        typed = new_typed if typed is None else pd.concat([typed, new_typed])
+        entry["typed"] = typed
+    return typed if typed is not None else to_typed_frame(entry["df"])
+
+# Estados que cuentan como eventos de un número: el último de cada número es su estado actual
+EVENT_STATES = ("vendido", "reservado", "cancelado")
+
+def _events(typed, total_numbers=1000):
+    """Filas tipadas que son eventos válidos de un número de la rifa
+
+    Los números fuera de rango no entran en la proyección (la revisión de integridad los marca).
+    """
+    numero = typed['numero']
+    valid = numero.notna() & ((numero >= 1) & (numero <= total_numbers)).fillna(False)
+    return typed[typed['estado'].isin(EVENT_STATES) & valid]
+
+def _chronological(events):
+    """Ordena eventos por fecha y, a igual fecha, por hoja y fila de origen
+
+    En la vista particionada las filas vienen agrupadas por hoja y no por tiempo, así que
+    el orden de las filas no sirve como orden de los eventos. Sin hoja de origen se
+    desempata por la fila. Un evento sin fecha válida va detrás de la fila anterior de
+    su hoja (columna orden); solo los que no tienen ninguna antes cuentan como los más antiguos.
+    """
+    if 'fila' in events.columns:
+        origin = {'hoja': events['hoja'].astype(str).to_numpy(), 'fila': events['fila'].to_numpy()}
+    else:
+        origin = {'hoja': "", 'fila': events.index.to_numpy()}
+    keys = pd.DataFrame({'fecha': events['orden'].to_numpy(), **origin})
+    order = keys.sort_values(['fecha', 'hoja', 'fila'], kind='stable', na_position='first').index
+    return events.iloc[order]
+
+def fold_number_states(states, typed, total_numbers=1000):
+    """Aplica filas tipadas (eventos) a la proyección del último estado por número
+
+    La proyección tiene una fila por número: la de su último evento en orden cronológico,
+    con el mismo índice de fila que en la hoja. Sin proyección previa es la reconstrucción
+    completa, en una sola pasada vectorizada; con ella, un evento nuevo más antiguo que el
+    estado vigente no lo reemplaza, así que el resultado es el mismo que reconstruir.
+    """
+    events = _events(typed, total_numbers)
+    if states is not None and not states.empty:
+        events = pd.concat([states, events])
+    return _chronological(events).drop_duplicates('numero', keep='last').sort_values('numero')
+
+def number_states(df, total_numbers=1000):
+    """Proyección del último estado por número a partir de todas las filas de un DataFrame"""
+    return fold_number_states(None, to_typed_frame(df), total_numbers)
+
+@_with_entry_lock
+def get_number_states(entry, total_numbers=1000):
+    """Devuelve la proyección del último estado por número, aplicando solo los eventos nuevos"""
+    typed = get_typed_frame(entry)
+    state = entry.get("states")
+    if state is None or state["total"] != total_numbers:
+        state = entry["states"] = {"done": 0, "states": None, "total": total_numbers}
+    if state["states"] is None or state["done"] < len(typed):
+        state["states"] = fold_number_states(state["states"], typed.iloc[state["done"]:], total_numbers)
+        state["done"] = len(typed)
+    return state["states"]
+
+# Columnas del reporte de conflictos de integridad
+INTEGRITY_COLUMNS = ["hoja", "fila", "numero", "vendedor", "nombre_comprador", "problema"]
+
+# Eventos que no pueden llegar sobre un número cuyo estado actual es vendido (sin cancelarlo antes)
+STATE_CONFLICTS = {
+    "vendido": "número vendido más de una vez",
+    "reservado": "reserva de un número vendido",
+}
+
+def _scan_rows(typed, total_numbers):
+    """Revisa en una sola pasada vectorizada los problemas propios de cada fila"""
+    numero = typed['numero']
+    checks = {
+        "número no numérico": numero.isna(),
+        "número fuera de rango": numero.notna() & ((numero < 1) | (numero > total_numbers)).fillna(False),
+        # Se ordena por la fila anterior de su hoja, pero conviene corregirla
+        "fecha no válida": typed['fecha'].isna(),
+        # Una cancelación puede no repetir el monto ni el comprador
+        "monto no numérico": typed['monto'].isna() & (typed['estado'] == 'vendido'),
+        "comprador vacío": (typed['nombre_comprador'] == "") & (typed['estado'] != 'cancelado'),
+    }
+    frames = []
+    for problema, mask in checks.items():
+        if mask.any():
+            flagged = typed.loc[mask, ['numero', 'vendedor', 'nombre_comprador']].copy()
+            flagged['problema'] = problema
+            frames.append(flagged)
+    return frames
+
+@_with_entry_lock
+def scan_integrity(entry, total_numbers=1000):
+    """Detecta ventas sobre números ya vendidos y filas inválidas, revisando solo las filas nuevas"""
+    typed = get_typed_frame(entry)
+    state = entry.setdefault("integrity", {
+        "scanned": 0,
+        "states": None,
+        "report": pd.DataFrame(columns=INTEGRITY_COLUMNS),
+    })
+    if state["scanned"] >= len(typed):
+        return state["report"]
+
+    new_rows = typed.iloc[state["scanned"]:]
+    frames = _scan_rows(new_rows, total_numbers)
+
+    # Conflictos de estado: cada evento nuevo se compara con el estado anterior del
+    # número, sea de un evento previo del mismo lote o de la proyección ya escaneada
+    events = _chronological(_events(new_rows, total_numbers))
+    if not events.empty:
+        before = state["states"]
+        by_number = events['numero']
+        previous_state = events.groupby(by_number, sort=False)['estado'].shift()
+        previous_row = events.index.to_series().groupby(by_number, sort=False).shift()
+        if before is not None and not before.empty:
+            last = before.set_index('numero')
+            previous_state = previous_state.fillna(by_number.map(last['estado']))
+            previous_row = previous_row.fillna(by_number.map(pd.Series(before.index, index=last.index)))
+        for estado, problema in STATE_CONFLICTS.items():
+            conflict = (events['estado'] == estado) & (previous_state == 'vendido')
+            if conflict.any():
+                # Se marcan la fila en conflicto y la venta que pisa
+                rows = events.index[conflict].union(pd.Index(previous_row[conflict].astype('int64')))
+                flagged = typed.loc[rows, ['numero', 'vendedor', 'nombre_comprador']].copy()
+                flagged['problema'] = problema
+                frames.append(flagged)
+        state["states"] = fold_number_states(before, new_rows, total_numbers)
+
+    if frames:
+        found = pd.concat(frames)
+        # En vistas particionadas cada fila trae su hoja y fila de origen; si no,
+        # la fila en la hoja es el índice más el encabezado
+        if 'fila' in typed.columns:
+            found.insert(0, 'hoja', typed.loc[found.index, 'hoja'].to_numpy())
+            found.insert(1, 'fila', typed.loc[found.index, 'fila'].to_numpy())
+        else:
+            found.insert(0, 'hoja', entry["worksheet"])
+            found.insert(1, 'fila', found.index + 2)
+        report = pd.concat([state["report"], found[INTEGRITY_COLUMNS]], ignore_index=True) if not state["report"].empty else found[INTEGRITY_COLUMNS].reset_index(drop=True)
+        state["report"] = report.drop_duplicates(subset=['hoja', 'fila', 'problema']).sort_values(['hoja', 'fila', 'problema'], ignore_index=True)
+    state["scanned"] = len(typed)
+    return state["report"]
+
+def integrity_report(df, total_numbers=1000):
+    """Revisión de integridad de todas las filas de un DataFrame (por ejemplo un CSV a importar)
+
+    La fila del reporte es la del archivo, contando el encabezado.
+    """
+    entry = _empty_entry()
+    entry.update(df=df, rows=len(df))
+    return scan_integrity(entry, total_numbers)
+
+# Columnas de las tablas de agregados por hora, día y vendedor
+ROLLUP_COLUMNS = ["ventas", "monto"]
+
+def _rollup(sold, key):
+    """Agrupa ventas por la clave dada contando números y sumando montos"""
+    grouped = sold.groupby(key).agg(ventas=('numero', 'size'), monto=('monto', 'sum'))
+    return grouped[ROLLUP_COLUMNS]
+
+def _merge_rollup(current, new):
+    """Suma un agregado parcial a uno acumulado"""
+    if current is None or current.empty:
+        return new
+    return current.add(new, fill_value=0).sort_index()
+
+@_with_entry_lock
+def get_rollups(entry):
+    """Devuelve los agregados de ventas por hora, día y vendedor, procesando solo las filas nuevas
+
+    Por hora y día se cuentan los eventos de venta, como ritmo de ventas (incluye ventas
+    canceladas después). Por vendedor y en "dia_vigentes" (por fecha de venta) se cuentan
+    las ventas vigentes de la proyección, así una cancelación descuenta.
+    """
+    typed = get_typed_frame(entry)
+    state = entry.setdefault("rollups", {"done": 0, "hora": None, "dia": None, "vendedor": None, "dia_vigentes": None})
+    if state["done"] < len(typed):
+        new_rows = typed.iloc[state["done"]:]
+        events = _events(new_rows)
+        sold = events[events['estado'] == 'vendido']
+        dated = sold[sold['fecha'].notna()]
+        state["hora"] = _merge_rollup(state["hora"], _rollup(dated, dated['fecha'].dt.floor('h')))
+        state["dia"] = _merge_rollup(state["dia"], _rollup(dated, dated['fecha'].dt.normalize()))
+        # Una fila por número: rehacerlo cuesta lo mismo que la cantidad de números, no de filas
+        states = get_number_states(entry)
+        current = states[states['estado'] == 'vendido']
+        state["vendedor"] = _rollup(current, 'vendedor')
+        # Una venta sin fecha legible cuenta en el día de la fila anterior de su hoja
+        current = current[current['orden'].notna()]
+        state["dia_vigentes"] = _rollup(current, current['orden'].dt.normalize())
+        state["done"] = len(typed)
+    empty = pd.DataFrame(columns=ROLLUP_COLUMNS)
+    return {name: state[name] if state[name] is not None else empty
+            for name in ("hora", "dia", "vendedor", "dia_vigentes")}
+
+def forecast_sell_out(daily, total_sold, total_numbers=1000, window_days=7, today=None):
+    """Estima la fecha de agotamiento según el ritmo de los últimos window_days días hasta hoy
+
+    Se promedian los días calendario, incluidos los días sin ventas: si hace días que no se
+    vende, el ritmo baja. Una rifa más nueva que la ventana se promedia desde su primera venta.
+    """
+    if daily.empty or total_sold >= total_numbers:
+        return None
+    today = pd.Timestamp(today or datetime.date.today()).normalize()
+    ventas = daily['ventas']
+    recent = ventas[(ventas.index > today - pd.Timedelta(days=window_days)) & (ventas.index <= today)]
+    days = max(1, min(window_days, (today - ventas.index[0]).days + 1))
+    rate = recent.sum() / days
+    if rate <= 0:
+        return None
+    days_left = (total_numbers - total_sold) / rate
+    return {
+        'ventas_por_dia': rate,
+        'dias_restantes': days_left,
+        'fecha_estimada': datetime.datetime.now() + datetime.timedelta(days=days_left),
+    }
+
+# Tasa de comisión usada cuando no hay configuración
+DEFAULT_COMMISSION_RATE = 0.1
+
+# Columnas de la liquidación de comisiones
+LEDGER_COLUMNS = ["vendedor", "ventas", "monto", "tasa", "comision"]
+
+def commission_config(config):
+    """Normaliza la configuración de comisiones (sección [comisiones] de los secrets)
+
+    Ejemplo en secrets.toml:
+
+        [comisiones]
+        tasa = 0.1                       # tasa general
+        vendedores = { "STELLA" = 0.12 } # tasas fijas por vendedor
+        tramos = [ { desde = 50, tasa = 0.12 }, { desde = 100, tasa = 0.15 } ]
+    """
+    return {
+        'tasa': float(config.get('tasa', DEFAULT_COMMISSION_RATE)),
+        'vendedores': {str(k): float(v) for k, v in config.get('vendedores', {}).items()},
+        'tramos': sorted((int(t['desde']), float(t['tasa'])) for t in config.get('tramos', [])),
+    }
+
+def commission_rates(ventas, vendedores, config):
+    """Calcula la tasa de cada vendedor: la fija si la tiene, si no la del tramo alcanzado"""
+    thresholds = np.array([0] + [desde for desde, _ in config['tramos']])
+    tier_rates = np.array([config['tasa']] + [tasa for _, tasa in config['tramos']])
+    # Cada vendedor cae en el último tramo cuyo mínimo de ventas alcanzó
+    rates = pd.Series(tier_rates[np.searchsorted(thresholds, np.asarray(ventas), side='right') - 1], index=vendedores)
+    overrides = pd.Series(config['vendedores'], dtype=float)
+    return overrides.reindex(vendedores).fillna(rates)
+
+def compute_commissions(per_vendor, config):
+    """Liquida las comisiones de todos los vendedores en una sola pasada vectorizada"""
+    if per_vendor.empty:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+    ledger = per_vendor[['ventas', 'monto']].copy()
+    ledger['tasa'] = commission_rates(ledger['ventas'], ledger.index, config).to_numpy()
+    ledger['comision'] = ledger['monto'] * ledger['tasa']
+    ledger.index.name = 'vendedor'
+    return ledger.reset_index()[LEDGER_COLUMNS].sort_values('comision', ascending=False, ignore_index=True)
+
+@_with_entry_lock
+def get_commission_ledger(entry, config):
+    """Devuelve la liquidación de comisiones, recalculada solo si cambiaron los datos o la configuración"""
+    rollups = get_rollups(entry)
+    key = (entry["rows"], repr(config))
+    cached = entry.get("ledger")
+    if cached is None or cached[0] != key:
+        cached = (key, compute_commissions(rollups['vendedor'], config))
+        entry["ledger"] = cached
+    return cached[1]
+
+def get_sold_numbers(states):
+    """Obtiene los números cuyo estado actual es vendido, según la proyección (get_number_states)"""
+    if states.empty:
+        return []
+    return states.loc[states['estado'] == 'vendido', 'numero'].astype(int).tolist()
+
+def get_ticket_sales(states, vendedor=None):
+    """Ventas vigentes con los datos del boleto, una por número, según la proyección"""
+    sold = states[states['estado'] == 'vendido']
+    if vendedor is not None:
+        sold = sold[sold['vendedor'] == vendedor]
+    return [
+        {"numero": int(numero), "vendedor": seller, "nombre_comprador": nombre,
+         "fecha": fecha.strftime("%Y-%m-%d %H:%M:%S") if pd.notna(fecha) else ""}
+        for numero, seller, nombre, fecha in sold[['numero', 'vendedor', 'nombre_comprador', 'fecha']].itertuples(index=False)
+    ]
+
+def get_available_numbers(states, total_numbers=1000):
+    """Obtiene los números disponibles: sin eventos o con la última venta o reserva cancelada"""
+    if states.empty:
+        return list(range(1, total_numbers + 1))
+    
+    taken = set(states.loc[states['estado'] != 'cancelado', 'numero'].astype(int))
+    available = [num for num in range(1, total_numbers + 1) if num not in taken]
+    return available
+
+def get_sales_summary(states):
+    """Genera resumen de ventas a partir de la proyección de estados"""
+    if states.empty:
+        return {
+            'total_vendidos': 0,
+            'total_reservados': 0,
+            'total_disponibles': 1000,
+            'monto_total': 0,
+            'ventas_por_vendedor': {}
+        }
+    
+    sold_df = states[states['estado'] == 'vendido']
+    reserved = int((states['estado'] == 'reservado').sum())
+    
+    summary = {
+        'total_vendidos': len(sold_df),
+        'total_reservados': reserved,
+        'total_disponibles': 1000 - len(sold_df) - reserved,
+        'monto_total': sold_df['monto'].sum() if not sold_df.empty else 0,
+        'ventas_por_vendedor': sold_df.groupby('vendedor').size().to_dict() if not sold_df.empty else {}
+    }
+    
+    return summary
+
+def draw_winner(states, rng=random):
+    """Sortea un número entre los vendidos y devuelve el número y los datos de su venta vigente"""
+    sold = states[states['estado'] == 'vendido']
+    if sold.empty:
+        return None, None
+    ganador = rng.choice(sold['numero'].astype(int).tolist())
+    winner_data = sold[sold['numero'] == ganador].iloc[0]
+    return ganador, winner_data
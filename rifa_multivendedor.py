@@ -1,12 +1,27 @@
 import streamlit as st
-import gspread
 import pandas as pd
-from google.oauth2.service_account import Credentials
 import datetime
-import random
-import time
 from typing import Dict, List, Any
 
+import rifa_api
+import rifa_boletos
+import rifa_datos
+from rifa_datos import (
+    get_available_numbers, get_sales_summary, get_sold_numbers, get_rollups, forecast_sell_out,
+    scan_integrity, commission_rates, get_commission_ledger, draw_winner, get_ticket_sales, get_number_states
+)
+
+# Columnas que necesita cada página; None = todas, incluidos los datos de compradores
+PAGE_COLUMNS = {
+    "🏠 Inicio": rifa_datos.PUBLIC_COLUMNS,
+    "🛒 Comprar Número": rifa_datos.PUBLIC_COLUMNS,
+    "👥 Panel Vendedor": None,
+    "📊 Administración": None,
+}
+
+# La grilla son mil elementos: se redibuja con menos frecuencia que las métricas
+GRID_REFRESH_SECONDS = 30
+
 # Configuración de la página
 st.set_page_config(
     page_title="Rifa Multivendedor",
@@ -20,95 +35,90 @@ st.set_page_config(
 def init_connection():
     """Inicializa la conexión con Google Sheets usando las credenciales del secrets"""
     try:
-        # Configurar credenciales desde st.secrets
-        credentials = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-        )
-        
-        # Conectar con Google Sheets
-        gc = gspread.authorize(credentials)
-        sheet_id = st.secrets["GOOGLE_SHEET_ID"]
-        return gc, sheet_id
+        # Conectar con Google Sheets usando las credenciales de st.secrets
+        # (una sola cuenta de servicio para todas las rifas)
+        return rifa_datos.connect(st.secrets["gcp_service_account"])
     except Exception as e:
         st.error(f"Error de conexión: {e}")
-        return None, None
+        return None
+
+@st.cache_resource
+def start_availability_api():
+    """Inicia la API JSON de disponibilidad una sola vez por proceso, si API_PORT está configurado"""
+    port = st.secrets.get("API_PORT")
+    if not port:
+        return None
+    try:
+        return rifa_api.start_server(get_raffles(), int(port), gc=init_connection())
+    except OSError as e:
+        st.warning(f"No se pudo iniciar la API de disponibilidad: {e}")
+        return None
+
+def get_raffles():
+    """Rifas configuradas en los secrets ([rifas], o GOOGLE_SHEET_ID para una sola)"""
+    return rifa_datos.raffle_config(st.secrets.get("rifas"), st.secrets.get("GOOGLE_SHEET_ID"), st.secrets.get("particiones"))
+
+def select_raffle(raffles):
+    """Elige la rifa de la sesión: selector en la barra lateral y ?rifa= en la URL para compartir el enlace"""
+    if len(raffles) == 1:
+        st.session_state["rifa"] = next(iter(raffles))
+    else:
+        if st.session_state.get("rifa") not in raffles:
+            pedida = st.query_params.get("rifa")
+            st.session_state["rifa"] = pedida if pedida in raffles else next(iter(raffles))
+        st.sidebar.selectbox("🎟️ Rifa", list(raffles), format_func=lambda slug: raffles[slug]["nombre"], key="rifa")
+        st.query_params["rifa"] = st.session_state["rifa"]
+    return raffles[st.session_state["rifa"]]
 
-def get_sheet_data(gc, sheet_id, worksheet_name="ventas"):
-    """Obtiene datos de la hoja de cálculo"""
+def current_raffle():
+    """Configuración de la rifa elegida en esta sesión"""
+    return get_raffles()[st.session_state["rifa"]]
+
+def get_shard_spec():
+    """Configuración de particiones de la hoja de ventas de la rifa elegida"""
+    return current_raffle()["particiones"]
+
+def get_snapshot(gc, sheet_id, worksheet_name="ventas", columns=None):
+    """Obtiene la lectura en caché de la hoja, mostrando el error si la API falla"""
+    shards = get_shard_spec()
     try:
-        sheet = gc.open_by_key(sheet_id)
-        worksheet = sheet.worksheet(worksheet_name)
-        data = worksheet.get_all_records()
-        return pd.DataFrame(data)
+        return rifa_datos.get_snapshot(gc, sheet_id, worksheet_name, columns, shards)
     except Exception as e:
         st.error(f"Error al obtener datos: {e}")
-        return pd.DataFrame()
+        return rifa_datos.cached_snapshot(sheet_id, worksheet_name, columns, shards)
+
+def get_states(gc, sheet_id, worksheet_name="ventas", columns=None):
+    """Obtiene el estado actual de cada número (último evento de la hoja)"""
+    return get_number_states(get_snapshot(gc, sheet_id, worksheet_name, columns))
 
 def add_sale_to_sheet(gc, sheet_id, sale_data, worksheet_name="ventas"):
     """Agrega una nueva venta a la hoja de cálculo"""
     try:
-        sheet = gc.open_by_key(sheet_id)
-        
-        # Intentar acceder a la hoja, si no existe la creamos
-        try:
-            worksheet = sheet.worksheet(worksheet_name)
-        except gspread.WorksheetNotFound:
-            # Crear hoja con headers
-            worksheet = sheet.add_worksheet(title=worksheet_name, rows="1000", cols="10")
-            headers = ["fecha", "vendedor", "numero", "nombre_comprador", "telefono", "email", "monto", "estado", "observaciones"]
-            worksheet.append_row(headers)
-        
-        # Agregar nueva fila
-        row_data = [
-            sale_data["fecha"],
-            sale_data["vendedor"],
-            sale_data["numero"],
-            sale_data["nombre_comprador"],
-            sale_data["telefono"],
-            sale_data["email"],
-            sale_data["monto"],
-            sale_data["estado"],
-            sale_data.get("observaciones", "")
-        ]
-        worksheet.append_row(row_data)
+        rifa_datos.add_sale_to_sheet(gc, sheet_id, sale_data, worksheet_name, get_shard_spec())
         return True
     except Exception as e:
         st.error(f"Error al guardar venta: {e}")
         return False
 
-def get_available_numbers(df, total_numbers=1000):
-    """Obtiene los números disponibles para la rifa"""
-    if df.empty:
-        return list(range(1, total_numbers + 1))
-    
-    sold_numbers = df[df['estado'] == 'vendido']['numero'].astype(int).tolist()
-    available = [num for num in range(1, total_numbers + 1) if num not in sold_numbers]
-    return available
+def get_commission_config():
+    """Lee la configuración de comisiones desde los secrets"""
+    return rifa_datos.commission_config(st.secrets.get("comisiones", {}))
 
-def get_sales_summary(df):
-    """Genera resumen de ventas"""
-    if df.empty:
-        return {
-            'total_vendidos': 0,
-            'total_disponibles': 1000,
-            'monto_total': 0,
-            'ventas_por_vendedor': {}
-        }
-    
-    sold_df = df[df['estado'] == 'vendido']
-    
-    summary = {
-        'total_vendidos': len(sold_df),
-        'total_disponibles': 1000 - len(sold_df),
-        'monto_total': sold_df['monto'].astype(float).sum() if not sold_df.empty else 0,
-        'ventas_por_vendedor': sold_df.groupby('vendedor').size().to_dict() if not sold_df.empty else {}
-    }
-    
-    return summary
+def get_ticket_secret():
+    """Clave de los códigos de verificación de los boletos (None si no hay ninguna configurada)"""
+    return rifa_boletos.ticket_secret(st.secrets)
+
+def tickets_download(sales, file_name, key):
+    """Botón que genera el zip con los boletos de las ventas y lo ofrece para descargar"""
+    secret = get_ticket_secret()
+    if secret is None:
+        st.info("Configura BOLETOS_CLAVE en los secrets para generar boletos")
+        return
+    formato = st.radio("Formato", list(rifa_boletos.FORMATS), horizontal=True, key=f"{key}_formato")
+    if st.button(f"🎟️ Generar {len(sales)} boletos", key=f"{key}_generar", disabled=not sales):
+        with st.spinner("Generando boletos..."):
+            data = rifa_boletos.tickets_zip_bytes(sales, secret, formato)
+        st.download_button("📥 Descargar boletos", data=data, file_name=file_name, mime="application/zip", key=f"{key}_descargar")
 
 # CSS personalizado
 def load_css():
@@ -214,6 +224,214 @@ def display_number_grid(available_numbers, sold_numbers, total_numbers=1000):
                     st.markdown(f'<div style="background-color: #ff6b6b; color: white; padding: 10px; text-align: center; border-radius: 5px; margin: 2px;">{num}</div>', unsafe_allow_html=True)
                 elif num in available_numbers:
                     st.markdown(f'<div style="background-color: #51cf66; color: white; padding: 10px; text-align: center; border-radius: 5px; margin: 2px;">{num}</div>', unsafe_allow_html=True)
+                else:
+                    # Reservado: ni vendido ni disponible
+                    st.markdown(f'<div style="background-color: #fcc419; color: white; padding: 10px; text-align: center; border-radius: 5px; margin: 2px;">{num}</div>', unsafe_allow_html=True)
+
+@st.fragment(run_every=rifa_datos.PROBE_INTERVAL_SECONDS)
+def show_metrics(gc, sheet_id):
+    """Fila de métricas de la página de inicio; se refresca sola sin re-ejecutar la página"""
+    summary = get_sales_summary(get_states(gc, sheet_id, columns=PAGE_COLUMNS["🏠 Inicio"]))
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("📊 Números Vendidos", summary['total_vendidos'])
+    
+    with col2:
+        st.metric("✅ Números Disponibles", summary['total_disponibles'])
+    
+    with col3:
+        st.metric("💰 Recaudación Total", f"${summary['monto_total']:,.0f}")
+    
+    with col4:
+        progress = summary['total_vendidos'] / 1000 * 100
+        st.metric("📈 Progreso", f"{progress:.1f}%")
+
+@st.fragment(run_every=GRID_REFRESH_SECONDS)
+def show_number_grid(gc, sheet_id):
+    """Grilla de números como fragmento propio, con su propio intervalo de refresco"""
+    states = get_states(gc, sheet_id, columns=PAGE_COLUMNS["🏠 Inicio"])
+    display_number_grid(set(get_available_numbers(states)), set(get_sold_numbers(states)))
+
+@st.fragment
+def purchase_form(gc, sheet_id):
+    """Formulario de compra; al confirmar solo se re-ejecuta este fragmento, no toda la página"""
+    # Mensaje de la compra anterior, que sobrevive a la re-ejecución del fragmento
+    mensaje = st.session_state.pop("compra_exitosa", None)
+    if mensaje:
+        st.success(mensaje)
+        st.balloons()
+    boleto_key = f"boleto_compra_{sheet_id}"
+    if st.session_state.get("compra_confirmar"):
+        # Empieza otra compra: el boleto de la anterior ya no se ofrece
+        st.session_state.pop(boleto_key, None)
+    boleto = st.session_state.get(boleto_key)
+    secret = get_ticket_secret()
+    if boleto and secret:
+        # El boleto lleva el nombre del comprador: se genera solo si se pide y se olvida al
+        # descargarlo, así no queda a la vista del siguiente comprador en el mismo navegador
+        if st.button(f"🎟️ Generar boleto del número {boleto['numero']}", key="boleto_compra_generar"):
+            st.download_button("📥 Descargar boleto", data=rifa_boletos.render_ticket(boleto, secret, "pdf"),
+                               file_name=rifa_boletos.ticket_filename(boleto, "pdf"), mime="application/pdf",
+                               key="boleto_compra_descargar", on_click=st.session_state.pop, args=(boleto_key, None))
+    
+    available_numbers = get_available_numbers(get_states(gc, sheet_id, columns=PAGE_COLUMNS["🛒 Comprar Número"]))
+    if not available_numbers:
+        st.error("¡Lo sentimos! Todos los números han sido vendidos.")
+        return
+    
+    with st.form("compra_form"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**Información del Comprador**")
+            nombre = st.text_input("Nombre completo *")
+            telefono = st.text_input("Teléfono *")
+            email = st.text_input("Email")
+            
+        with col2:
+            st.markdown("**Detalles de la Compra**")
+            vendedor = st.selectbox("Vendedor *", ["Vendedor 1",
+                                                   "Vendedor 2", 
+                                                   "Vendedor 3",
+                                                   "Vendedor 4", 
+                                                   "Vendedor 5", 
+                                                   "Vendedor 6", 
+                                                   "Vendedor 7", 
+                                                   "Vendedor 8", 
+                                                   "Vendedor 9", 
+                                                   "Vendedor 10", 
+                                                   "Vendedor 11",
+                                                   "Otro"])
+            if vendedor == "Otro":
+                vendedor = st.text_input("Nombre del vendedor")
+            
+            numero_seleccionado = st.selectbox("Número a comprar *", available_numbers)
+            monto = st.number_input("Monto ($)", value=2500, min_value=1000)
+            observaciones = st.text_area("Observaciones", placeholder="Información adicional...")
+        
+        submitted = st.form_submit_button("💳 Confirmar Compra", use_container_width=True, key="compra_confirmar")
+        
+        if submitted:
+            if not nombre or not telefono or not vendedor:
+                st.error("Por favor completa todos los campos obligatorios (*)")
+            else:
+                # Preparar datos de venta
+                sale_data = {
+                    "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "vendedor": vendedor,
+                    "numero": numero_seleccionado,
+                    "nombre_comprador": nombre,
+                    "telefono": telefono,
+                    "email": email,
+                    "monto": monto,
+                    "estado": "vendido",
+                    "observaciones": observaciones
+                }
+                
+                # Guardar en Google Sheets
+                with st.spinner("Procesando compra..."):
+                    success = add_sale_to_sheet(gc, sheet_id, sale_data)
+                
+                if success:
+                    # La venta ya está en la lectura en memoria: basta con redibujar el formulario
+                    st.session_state["compra_exitosa"] = f"¡Compra exitosa! Número {numero_seleccionado} vendido a {nombre}"
+                    st.session_state[boleto_key] = {field: sale_data[field] for field in ("numero", "vendedor", "nombre_comprador", "fecha")}
+                    st.rerun(scope="fragment")
+                else:
+                    st.error("Error al procesar la compra. Intenta nuevamente.")
+
+@st.fragment
+def vendor_panel(gc, sheet_id, vendedor_filter):
+    """Estadísticas, registro y venta manual de un vendedor
+
+    Es un fragmento: una venta manual redibuja solo este panel, que ya ve la venta
+    en la lectura en memoria.
+    """
+    mensaje = st.session_state.pop("venta_manual_exitosa", None)
+    snapshot = get_snapshot(gc, sheet_id, columns=PAGE_COLUMNS["👥 Panel Vendedor"])
+    df = snapshot["df"]
+    states = get_number_states(snapshot)
+    
+    if vendedor_filter != "Todos" and not df.empty:
+        df_filtered = df[df['vendedor'] == vendedor_filter]
+    else:
+        df_filtered = df
+    
+    # Estadísticas del vendedor
+    if vendedor_filter != "Todos":
+        col1, col2, col3 = st.columns(3)
+        # Ventas vigentes: las canceladas después no cuentan
+        vendedor_sales = states[(states['estado'] == 'vendido') & (states['vendedor'] == vendedor_filter)]
+        
+        with col1:
+            st.metric("Números Vendidos", len(vendedor_sales))
+        with col2:
+            total_vendedor = vendedor_sales['monto'].sum()
+            st.metric("Total Recaudado", f"${total_vendedor:,.0f}")
+        with col3:
+            commission_config = get_commission_config()
+            ledger = get_commission_ledger(snapshot, commission_config)
+            fila = ledger[ledger['vendedor'] == vendedor_filter]
+            if fila.empty:
+                tasa = commission_rates([0], [vendedor_filter], commission_config).iloc[0]
+                comision = 0
+            else:
+                tasa, comision = fila['tasa'].iloc[0], fila['comision'].iloc[0]
+            st.metric(f"Comisión ({tasa:.0%})", f"${comision:,.0f}")
+    
+    # Tabla de ventas
+    st.markdown("### 📊 Registro de Ventas")
+    if not df_filtered.empty:
+        st.dataframe(
+            df_filtered,
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No hay ventas registradas para este vendedor")
+    
+    if vendedor_filter != "Todos":
+        with st.expander("🎟️ Boletos del Vendedor"):
+            tickets_download(get_ticket_sales(states, vendedor_filter), f"boletos_{vendedor_filter}.zip", "boletos_vendedor")
+    
+    # Botón para agregar venta manual
+    with st.expander("➕ Agregar Venta Manual"):
+        if mensaje:
+            st.success(mensaje)
+        with st.form("venta_manual"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                nombre_manual = st.text_input("Nombre del comprador")
+                telefono_manual = st.text_input("Teléfono")
+                vendedor_manual = st.text_input("Vendedor", value=vendedor_filter if vendedor_filter != "Todos" else "")
+            
+            with col2:
+                numero_manual = st.selectbox("Número", get_available_numbers(states))
+                monto_manual = st.number_input("Monto", value=2500)
+                email_manual = st.text_input("Email (opcional)")
+            
+            if st.form_submit_button("Guardar Venta"):
+                if nombre_manual and telefono_manual and vendedor_manual:
+                    sale_data = {
+                        "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "vendedor": vendedor_manual,
+                        "numero": numero_manual,
+                        "nombre_comprador": nombre_manual,
+                        "telefono": telefono_manual,
+                        "email": email_manual,
+                        "monto": monto_manual,
+                        "estado": "vendido",
+                        "observaciones": "Venta manual"
+                    }
+                    
+                    success = add_sale_to_sheet(gc, sheet_id, sale_data)
+                    if success:
+                        st.session_state["venta_manual_exitosa"] = "Venta agregada exitosamente"
+                        st.rerun(scope="fragment")
+                else:
+                    st.error("Completa todos los campos requeridos")
 
 def show_user_manual():
     """Muestra el manual de usuario completo"""
@@ -743,14 +961,21 @@ def main():
     """, unsafe_allow_html=True)
     
     # Inicializar conexión
-    gc, sheet_id = init_connection()
+    gc = init_connection()
+    raffles = get_raffles()
     
-    if gc is None or sheet_id is None:
+    if gc is None or not raffles:
         st.error("No se pudo establecer conexión con Google Sheets. Verifica la configuración.")
         return
     
+    start_availability_api()
+    
     # Sidebar para navegación
     st.sidebar.title("🎯 Navegación")
+    raffle = select_raffle(raffles)
+    sheet_id = raffle["sheet_id"]
+    if len(raffles) > 1:
+        st.markdown(f"## 🎟️ {raffle['nombre']}")
     page = st.sidebar.selectbox(
         "Selecciona una opción:",
         ["🏠 Inicio", "🛒 Comprar Número", "📖 Manual de Usuario", "👥 Panel Vendedor", "📊 Administración"]
@@ -762,30 +987,16 @@ def main():
         return
     
     # Obtener datos actuales
-    df = get_sheet_data(gc, sheet_id)
-    available_numbers = get_available_numbers(df)
-    sold_numbers = df[df['estado'] == 'vendido']['numero'].astype(int).tolist() if not df.empty else []
-    summary = get_sales_summary(df)
+    # Las páginas públicas cargan solo las columnas sin datos de compradores
+    snapshot = get_snapshot(gc, sheet_id, columns=PAGE_COLUMNS[page])
+    df = snapshot["df"]
+    states = get_number_states(snapshot)
+    summary = get_sales_summary(states)
     
     if page == "🏠 Inicio":
-        # Página de inicio
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("📊 Números Vendidos", summary['total_vendidos'])
-        
-        with col2:
-            st.metric("✅ Números Disponibles", summary['total_disponibles'])
-        
-        with col3:
-            st.metric("💰 Recaudación Total", f"${summary['monto_total']:,.0f}")
-        
-        with col4:
-            progress = summary['total_vendidos'] / 1000 * 100
-            st.metric("📈 Progreso", f"{progress:.1f}%")
-        
-        # Mostrar grilla de números
-        display_number_grid(available_numbers, sold_numbers)
+        # Página de inicio: métricas y grilla se actualizan solas, cada una por su cuenta
+        show_metrics(gc, sheet_id)
+        show_number_grid(gc, sheet_id)
         
         # Información adicional
         st.markdown("---")
@@ -808,71 +1019,7 @@ def main():
     
     elif page == "🛒 Comprar Número":
         st.markdown("### 🛒 Comprar Número de Rifa")
-        
-        if not available_numbers:
-            st.error("¡Lo sentimos! Todos los números han sido vendidos.")
-            return
-        
-        with st.form("compra_form"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("**Información del Comprador**")
-                nombre = st.text_input("Nombre completo *")
-                telefono = st.text_input("Teléfono *")
-                email = st.text_input("Email")
-                
-            with col2:
-                st.markdown("**Detalles de la Compra**")
-                vendedor = st.selectbox("Vendedor *", ["Vendedor 1",
-                                                       "Vendedor 2", 
-                                                       "Vendedor 3",
-                                                       "Vendedor 4", 
-                                                       "Vendedor 5", 
-                                                       "Vendedor 6", 
-                                                       "Vendedor 7", 
-                                                       "Vendedor 8", 
-                                                       "Vendedor 9", 
-                                                       "Vendedor 10", 
-                                                       "Vendedor 11",
-                                                       "Otro"])
-                if vendedor == "Otro":
-                    vendedor = st.text_input("Nombre del vendedor")
-                
-                numero_seleccionado = st.selectbox("Número a comprar *", available_numbers)
-                monto = st.number_input("Monto ($)", value=2500, min_value=1000)
-                observaciones = st.text_area("Observaciones", placeholder="Información adicional...")
-            
-            submitted = st.form_submit_button("💳 Confirmar Compra", use_container_width=True)
-            
-            if submitted:
-                if not nombre or not telefono or not vendedor:
-                    st.error("Por favor completa todos los campos obligatorios (*)")
-                else:
-                    # Preparar datos de venta
-                    sale_data = {
-                        "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "vendedor": vendedor,
-                        "numero": numero_seleccionado,
-                        "nombre_comprador": nombre,
-                        "telefono": telefono,
-                        "email": email,
-                        "monto": monto,
-                        "estado": "vendido",
-                        "observaciones": observaciones
-                    }
-                    
-                    # Guardar en Google Sheets
-                    with st.spinner("Procesando compra..."):
-                        success = add_sale_to_sheet(gc, sheet_id, sale_data)
-                    
-                    if success:
-                        st.success(f"¡Compra exitosa! Número {numero_seleccionado} vendido a {nombre}")
-                        st.balloons()
-                        time.sleep(2)
-                        st.rerun()
-                    else:
-                        st.error("Error al procesar la compra. Intenta nuevamente.")
+        purchase_form(gc, sheet_id)
     
     elif page == "👥 Panel Vendedor":
         st.markdown("### 👥 Panel del Vendedor")
@@ -880,81 +1027,19 @@ def main():
         vendedor_filter = st.selectbox("Seleccionar Vendedor", 
                                      ["Todos"] + list(summary['ventas_por_vendedor'].keys()) + ["ENRIQUE CARDENAS", "MARCELA RAGGI", "STELLA"])
         
-        if vendedor_filter != "Todos" and not df.empty:
-            df_filtered = df[df['vendedor'] == vendedor_filter]
-        else:
-            df_filtered = df
-        
-        # Estadísticas del vendedor
-        if vendedor_filter != "Todos":
-            col1, col2, col3 = st.columns(3)
-            vendedor_sales = df_filtered[df_filtered['estado'] == 'vendido'] if not df_filtered.empty else pd.DataFrame()
-            
-            with col1:
-                st.metric("Números Vendidos", len(vendedor_sales))
-            with col2:
-                total_vendedor = vendedor_sales['monto'].astype(float).sum() if not vendedor_sales.empty else 0
-                st.metric("Total Recaudado", f"${total_vendedor:,.0f}")
-            with col3:
-                comision = total_vendedor * 0.1  # 10% de comisión
-                st.metric("Comisión (10%)", f"${comision:,.0f}")
-        
-        # Tabla de ventas
-        st.markdown("### 📊 Registro de Ventas")
-        if not df_filtered.empty:
-            st.dataframe(
-                df_filtered,
-                use_container_width=True,
-                hide_index=True
-            )
-        else:
-            st.info("No hay ventas registradas para este vendedor")
-        
-        # Botón para agregar venta manual
-        with st.expander("➕ Agregar Venta Manual"):
-            with st.form("venta_manual"):
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    nombre_manual = st.text_input("Nombre del comprador")
-                    telefono_manual = st.text_input("Teléfono")
-                    vendedor_manual = st.text_input("Vendedor", value=vendedor_filter if vendedor_filter != "Todos" else "")
-                
-                with col2:
-                    numero_manual = st.selectbox("Número", available_numbers)
-                    monto_manual = st.number_input("Monto", value=2500)
-                    email_manual = st.text_input("Email (opcional)")
-                
-                if st.form_submit_button("Guardar Venta"):
-                    if nombre_manual and telefono_manual and vendedor_manual:
-                        sale_data = {
-                            "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "vendedor": vendedor_manual,
-                            "numero": numero_manual,
-                            "nombre_comprador": nombre_manual,
-                            "telefono": telefono_manual,
-                            "email": email_manual,
-                            "monto": monto_manual,
-                            "estado": "vendido",
-                            "observaciones": "Venta manual"
-                        }
-                        
-                        success = add_sale_to_sheet(gc, sheet_id, sale_data)
-                        if success:
-                            st.success("Venta agregada exitosamente")
-                            time.sleep(1)
-                            st.rerun()
-                    else:
-                        st.error("Completa todos los campos requeridos")
+        vendor_panel(gc, sheet_id, vendedor_filter)
     
     elif page == "📊 Administración":
         st.markdown("### 📊 Panel de Administración")
         
+        objetivo = st.number_input("🎯 Objetivo de ventas", min_value=1, max_value=1000,
+                                   value=int(st.secrets.get("OBJETIVO_VENTAS", 90)), key="objetivo_ventas")
+        
         # Métricas generales
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Vendidos", summary['total_vendidos'], f"{summary['total_vendidos']-90} vs objetivo")
+            st.metric("Total Vendidos", summary['total_vendidos'], f"{summary['total_vendidos']-objetivo} vs objetivo")
         with col2:
             st.metric("Recaudación", f"${summary['monto_total']:,.0f}")
         with col3:
@@ -963,6 +1048,45 @@ def main():
         with col4:
             st.metric("Vendedores Activos", len(summary['ventas_por_vendedor']))
         
+        # Ritmo de ventas
+        st.markdown("### 📈 Ritmo de Ventas")
+        rollups = get_rollups(snapshot)
+        if rollups['dia'].empty:
+            st.info("Aún no hay ventas con fecha para graficar")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Ventas registradas por día**")
+                st.caption("Cada venta el día que se registró, aunque luego se haya cancelado")
+                st.bar_chart(rollups['dia']['ventas'])
+            with col2:
+                st.markdown("**Ventas vigentes acumuladas vs objetivo**")
+                st.caption("Sin las ventas canceladas, por fecha de venta")
+                acumulado = rollups['dia_vigentes'][['ventas']].cumsum().rename(columns={'ventas': 'acumulado'})
+                acumulado['objetivo'] = objetivo
+                st.line_chart(acumulado)
+            
+            st.markdown("**Ventas por hora (últimas 48 horas con actividad)**")
+            por_hora = rollups['hora']['ventas']
+            st.line_chart(por_hora[por_hora.index > por_hora.index[-1] - pd.Timedelta(hours=48)])
+            
+            pronostico = forecast_sell_out(rollups['dia_vigentes'], summary['total_vendidos'])
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                ritmo = pronostico['ventas_por_dia'] if pronostico else 0
+                st.metric("Ritmo (últimos 7 días)", f"{ritmo:.1f} por día")
+            with col2:
+                faltan = max(objetivo - summary['total_vendidos'], 0)
+                st.metric("Faltan para el objetivo", faltan)
+            with col3:
+                if pronostico:
+                    st.metric("Agotamiento estimado", pronostico['fecha_estimada'].strftime("%Y-%m-%d"))
+                else:
+                    st.metric("Agotamiento estimado", "—")
+            
+            st.markdown("**Ventas por vendedor**")
+            st.bar_chart(rollups['vendedor']['ventas'])
+        
         # Datos completos
         st.markdown("### 📋 Datos Completos")
         if not df.empty:
@@ -995,6 +1119,78 @@ def main():
         else:
             st.info("No hay datos para mostrar")
         
+        # Liquidación de comisiones
+        st.markdown("### 💸 Liquidación de Comisiones")
+        ledger = get_commission_ledger(snapshot, get_commission_config())
+        if ledger.empty:
+            st.info("No hay ventas para liquidar")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total a pagar", f"${ledger['comision'].sum():,.0f}")
+            with col2:
+                st.metric("Vendedores a liquidar", len(ledger))
+            st.dataframe(
+                ledger,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "monto": st.column_config.NumberColumn("monto", format="$%.0f"),
+                    "tasa": st.column_config.NumberColumn("tasa", format="%.2f"),
+                    "comision": st.column_config.NumberColumn("comision", format="$%.0f"),
+                }
+            )
+            st.download_button(
+                label="📥 Descargar Liquidación",
+                data=ledger.to_csv(index=False),
+                file_name=f"liquidacion_comisiones_{datetime.datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+        
+        # Integridad de datos
+        st.markdown("### 🔍 Integridad de Datos")
+        conflicts = scan_integrity(snapshot)
+        if conflicts.empty:
+            st.success("No se detectaron conflictos en los datos")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Filas con problemas", conflicts['fila'].nunique())
+            with col2:
+                st.metric("Números duplicados", conflicts.loc[conflicts['problema'] == "número vendido más de una vez", 'numero'].nunique())
+            st.dataframe(conflicts, use_container_width=True, hide_index=True)
+        
+        # Cuota de Google Sheets
+        with st.expander("⏱️ Cuota de Google Sheets"):
+            cuota = rifa_datos.governor.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Lecturas en cola", cuota['lecturas_en_cola'])
+            with col2:
+                st.metric("Escrituras en cola", cuota['escrituras_en_cola'])
+            with col3:
+                st.metric("Fichas disponibles", f"{cuota['fichas_disponibles']:.0f} / {rifa_datos.SHEETS_REQUESTS_PER_MINUTE}")
+            with col4:
+                espera_media = cuota['espera_total'] / cuota['llamadas'] if cuota['llamadas'] else 0
+                st.metric("Espera media", f"{espera_media:.2f} s")
+            st.caption(
+                f"Llamadas: {cuota['llamadas']} · Lecturas agrupadas: {cuota['lecturas_agrupadas']} · "
+                f"Reintentos por cuota: {cuota['reintentos']} · Espera máxima: {cuota['espera_maxima']:.2f} s"
+            )
+            memoria = rifa_datos.cache_stats()
+            st.caption(
+                f"Rifas en memoria: {memoria['rifas']} · "
+                f"Caché: {memoria['memoria_mb']:.1f} / {memoria['presupuesto_mb']:.0f} MB"
+            )
+        
+        # Perfilado
+        with st.expander("🔬 Perfilado de Rendimiento"):
+            st.write("Registra dónde se va el tiempo en la próxima ejecución de la página "
+                     "(también con `?perfilar=1` en la URL). Las descargas aparecen en la barra lateral.")
+            if st.button("🔬 Perfilar la próxima ejecución"):
+                st.session_state["perfilar_siguiente"] = True
+                st.info("Listo: navega a la página que quieres medir")
+        
         # Herramientas administrativas
         with st.expander("🛠️ Herramientas Administrativas"):
             col1, col2 = st.columns(2)
@@ -1002,9 +1198,8 @@ def main():
             with col1:
                 st.markdown("**Sorteo**")
                 if st.button("🎲 Realizar Sorteo"):
-                    if sold_numbers:
-                        ganador = random.choice(sold_numbers)
-                        winner_data = df[df['numero'].astype(int) == ganador].iloc[0]
+                    ganador, winner_data = draw_winner(states)
+                    if ganador is not None:
                         st.success(f"🏆 ¡Número ganador: {ganador}!")
                         st.info(f"Ganador: {winner_data['nombre_comprador']} - Tel: {winner_data['telefono']}")
                     else:
@@ -1014,6 +1209,82 @@ def main():
                 st.markdown("**Resetear Datos**")
                 if st.button("🗑️ Limpiar Datos", type="secondary"):
                     st.warning("Esta función eliminaría todos los datos. Implementar con cuidado.")
+            
+            col1, col2 = st.columns(2)
+            ticket_sales = get_ticket_sales(states)
+            
+            with col1:
+                st.markdown("**Boletos**")
+                tickets_download(ticket_sales, f"boletos_{datetime.datetime.now().strftime('%Y%m%d')}.zip", "boletos_todos")
+            
+            with col2:
+                st.markdown("**Verificar Boleto**")
+                numero_boleto = st.number_input("Número del boleto", min_value=1, max_value=1000, step=1)
+                codigo_boleto = st.text_input("Código de verificación", placeholder="XXXX-XXXX")
+                secret = get_ticket_secret()
+                if st.button("✔️ Verificar", disabled=secret is None):
+                    sale = next((sale for sale in ticket_sales if sale['numero'] == numero_boleto), None)
+                    if sale is not None and rifa_boletos.verify_code(sale, codigo_boleto, secret):
+                        st.success(f"Boleto válido: {sale['nombre_comprador']} - Vendedor: {sale['vendedor']}")
+                    else:
+                        st.error("El código no corresponde a ninguna venta de ese número")
+
+def profiling_requested():
+    """Indica si esta ejecución debe perfilarse (botón de Administración o ?perfilar=1)"""
+    if st.query_params.get("perfilar") == "1":
+        del st.query_params["perfilar"]
+        return True
+    return st.session_state.pop("perfilar_siguiente", False)
+
+def run_profiled():
+    """Ejecuta main() bajo un perfilador por muestreo y ofrece el resultado para descargar"""
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+    except ImportError:
+        st.sidebar.warning("Para perfilar instala pyinstrument (pip install pyinstrument)")
+        main()
+        return
+    
+    profiler = Profiler(interval=0.001, async_mode="disabled")
+    profiler.start()
+    try:
+        main()
+    finally:
+        # También cuando main() termina con st.rerun() o st.stop()
+        profiler.stop()
+        st.session_state["perfil"] = {
+            "fecha": datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "duracion": profiler.last_session.duration,
+            "html": profiler.output_html(),
+            "speedscope": profiler.output(SpeedscopeRenderer()),
+        }
+
+def show_profile_downloads():
+    """Muestra en la barra lateral las descargas del último perfil registrado"""
+    perfil = st.session_state.get("perfil")
+    if not perfil:
+        return
+    st.sidebar.markdown("---")
+    st.sidebar.markdown(f"**🔬 Último perfil:** {perfil['duracion']:.2f} s")
+    st.sidebar.download_button(
+        label="📥 Gráfico de llama (HTML)",
+        data=perfil["html"],
+        file_name=f"perfil_{perfil['fecha']}.html",
+        mime="text/html"
+    )
+    st.sidebar.download_button(
+        label="📥 Speedscope (JSON)",
+        data=perfil["speedscope"],
+        file_name=f"perfil_{perfil['fecha']}.speedscope.json",
+        mime="application/json"
+    )
 
 if __name__ == "__main__":
-    main()
+    # Sin perfilado pedido, main() corre sin ningún costo adicional
+    if profiling_requested():
+        run_profiled()
+    else:
+        main()
+    # Un solo lugar para las descargas: el perfil de esta ejecución o el de una anterior
+    show_profile_downloads()
@@ -0,0 +1,150 @@
+"""Copia local en disco de las lecturas de ventas, para arrancar sin descargar todo de nuevo
+
+Cada entrada de la caché (una hoja o proyección de columnas) se guarda como archivo
+Arrow IPC junto con su marca de agua: filas leídas, revisión y encabezados. Al
+reiniciar el contenedor se abre el archivo con memory-map y solo se descargan las filas
+agregadas después de la marca, así que la primera carga no depende de cuántas ventas
+haya.
+
+El directorio se configura con la variable de entorno RIFA_SNAPSHOT_DIR (por defecto
+.cache/rifa en la carpeta de la aplicación; las rutas relativas se toman desde ahí);
+vacía desactiva la copia. Ojo: las lecturas completas incluyen datos de compradores.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+def _resolve_dir(value):
+    """Ubica el directorio junto al código de la aplicación, no donde se la lanzó
+
+    Desde cron o systemd el directorio de trabajo puede ser cualquiera: una ruta relativa
+    dejaría copias con datos de compradores repartidas por el sistema.
+    """
+    if not value:
+        return ""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.expanduser(value))
+
+SNAPSHOT_DIR = _resolve_dir(os.environ.get("RIFA_SNAPSHOT_DIR", os.path.join(".cache", "rifa")))
+
+# Como mínimo entre dos guardados de la misma entrada; lo que falte lo trae el delta al arrancar
+SAVE_INTERVAL_SECONDS = 60
+
+# Un solo hilo de escritura: guardar nunca demora una página
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rifa-snapshot")
+_last_saved = {}
+_lock = threading.Lock()
+
+def _path(key):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"ventas_{digest}.arrow")
+
+# Versión del formato de los archivos; los de otra versión se ignoran y se descarga todo
+FORMAT_VERSION = 2
+
+# Partes numéricas de una columna mezclada, en columnas aparte del archivo
+_PARTS = {"entero": int, "decimal": float}
+
+def _to_table(df, metadata):
+    """Convierte el DataFrame crudo en tabla Arrow con los tipos reales de cada columna
+
+    Las columnas de un solo tipo (enteros, decimales o texto) van tal cual. Las que mezclan
+    números y texto, como un teléfono a veces escrito con guiones, se parten en una columna
+    de texto y otras con sus enteros y decimales, así al leer no hay que interpretar nada.
+    """
+    import pyarrow as pa
+    arrays, names, mixed = [], [], {}
+    parts = []
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != object:
+            arrays.append(pa.Array.from_pandas(values))
+            names.append(column)
+            continue
+        kinds = values.map(type)
+        numeric = pd.Series(False, index=values.index)
+        mixed[column] = {}
+        for part, kind in _PARTS.items():
+            mask = kinds == kind
+            if mask.any():
+                name = f"{column}:{part}"
+                pa_type = pa.int64() if kind is int else pa.float64()
+                parts.append((name, pa.array(values.where(mask), type=pa_type, from_pandas=True)))
+                mixed[column][part] = name
+                numeric |= mask
+        arrays.append(pa.array(values.where(~numeric), type=pa.string(), from_pandas=True))
+        names.append(column)
+    for name, array in parts:
+        arrays.append(array)
+        names.append(name)
+    metadata = dict(metadata, formato=FORMAT_VERSION, columnas=[str(column) for column in df.columns], mixtas=mixed)
+    return pa.Table.from_arrays(arrays, names=names).replace_schema_metadata({"rifa": json.dumps(metadata)})
+
+def _restore_frame(table, metadata):
+    """Arma el DataFrame crudo desde la tabla, sin volver a interpretar texto
+
+    Las columnas mezcladas se rearman como object, con enteros, decimales y texto como los
+    deja numericise_all al leer la hoja.
+    """
+    df = table.select(metadata["columnas"]).to_pandas()
+    for column, parts in metadata["mixtas"].items():
+        restored = df[column].astype(object)
+        for name in parts.values():
+            values = table.column(name)
+            mask = values.is_valid().to_numpy(zero_copy_only=False)
+            # astype(object) convierte a int y float de Python, igual que una lectura de la hoja
+            restored[mask] = values.drop_null().to_numpy().astype(object)
+        df[column] = restored
+    return df
+
+def _write(key, df, metadata):
+    import pyarrow.feather as feather
+    path = _path(key)
+    # Solo el usuario de la aplicación puede leer las copias
+    os.makedirs(SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+    tmp = f"{path}.tmp"
+    # Sin compresión: así el archivo se puede mapear en memoria directamente
+    feather.write_feather(_to_table(df, metadata), tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+def save_entry(key, entry, force=False):
+    """Programa el guardado de una entrada en segundo plano (limitado a uno por intervalo)"""
+    if not SNAPSHOT_DIR:
+        return
+    now = time.time()
+    with _lock:
+        if not force and now - _last_saved.get(key, 0) < SAVE_INTERVAL_SECONDS:
+            return
+        _last_saved[key] = now
+    metadata = {
+        "rows": entry["rows"],
+        "revision": entry["revision"],
+        "header": list(entry["header"]),
+        "worksheet": entry["worksheet"],
+        "columns": list(entry["columns"]) if entry["columns"] is not None else None,
+        "saved_at": now,
+    }
+    # El DataFrame de la entrada se reemplaza, nunca se modifica: se puede escribir desde otro hilo
+    _writer.submit(_write, key, entry["df"], metadata)
+
+def load_entry(key):
+    """Abre la copia en disco de una entrada; devuelve (df, metadatos) o None si no hay una válida"""
+    if not SNAPSHOT_DIR:
+        return None
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
+        metadata = json.loads(table.schema.metadata[b"rifa"])
+        if metadata.get("formato") != FORMAT_VERSION:
+            return None
+        return _restore_frame(table, metadata), metadata
+    except Exception:
+        # Archivo viejo o dañado: se ignora y se hace la descarga completa
+        return None
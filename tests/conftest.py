@@ -0,0 +1,116 @@
+"""Hoja de cálculo en memoria para probar rifa_datos sin Google Sheets"""
+import os
+import re
+import sys
+
+import gspread
+import pytest
+from gspread.utils import a1_to_rowcol
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rifa_datos
+import rifa_persistencia
+from rifa_cuota import RateGovernor
+
+class FakeResponse:
+    """Respuesta HTTP mínima para construir errores de la API"""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": ""}}
+
+class FakeCell:
+    def __init__(self, value):
+        self.value = value
+
+class FakeWorksheet:
+    def __init__(self, sheet, title):
+        self.sheet = sheet
+        self.title = title
+
+    def append_row(self, row, **kwargs):
+        self.sheet.data.setdefault(self.title, []).append([str(value) for value in row])
+
+    def append_rows(self, rows, **kwargs):
+        for row in rows:
+            self.append_row(row)
+        end = len(self.sheet.data[self.title])
+        return {"updates": {"updatedRange": f"'{self.title}'!A{end - len(rows) + 1}:I{end}"}}
+
+    def acell(self, label):
+        return FakeCell(self.sheet.cells.get((self.title, label)))
+
+    def update_acell(self, label, value):
+        self.sheet.cells[(self.title, label)] = str(value)
+
+class FakeSpreadsheet:
+    """Lo que rifa_datos usa de gspread.Spreadsheet, con los datos en listas de filas"""
+
+    def __init__(self, sheet_id="hoja"):
+        self.id = sheet_id
+        self.data = {}
+        self.cells = {}
+
+    def _missing(self, name):
+        return gspread.exceptions.APIError(FakeResponse(400, f"Unable to parse range: {name}"))
+
+    def worksheet(self, title):
+        if title not in self.data and not any(key[0] == title for key in self.cells):
+            raise gspread.WorksheetNotFound(title)
+        return FakeWorksheet(self, title)
+
+    def worksheets(self):
+        return [FakeWorksheet(self, title) for title in self.data]
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.data.setdefault(title, [])
+        return FakeWorksheet(self, title)
+
+    def values_get(self, name, params=None):
+        match = re.match(r"'([^']+)'(?:!([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?)?$", name)
+        title = match.group(1)
+        if title == rifa_datos.CONTROL_WORKSHEET:
+            if (title, "B1") not in self.cells:
+                raise self._missing(name)
+            return {"values": [[self.cells[(title, "B1")]]]}
+        if title not in self.data:
+            raise self._missing(name)
+        start = int(match.group(3) or 1)
+        end = int(match.group(5)) if match.group(5) else None
+        return {"values": self.data[title][start - 1:end]}
+
+    def values_batch_get(self, ranges, params=None):
+        value_ranges = []
+        for name in ranges:
+            match = re.match(r"'([^']+)'!([A-Z]+)(\d+):([A-Z]+)$", name)
+            column = a1_to_rowcol(f"{match.group(2)}1")[1] - 1
+            values = [row[column] if column < len(row) else "" for row in self.data[match.group(1)][int(match.group(3)) - 1:]]
+            # Como la API: sin las celdas vacías del final
+            while values and values[-1] == "":
+                values.pop()
+            value_ranges.append({"range": name, "values": [values]} if values else {"range": name})
+        return {"valueRanges": value_ranges}
+
+class FakeClient:
+    def __init__(self):
+        self.spreadsheets = {}
+
+    def open_by_key(self, sheet_id):
+        return self.spreadsheets.setdefault(sheet_id, FakeSpreadsheet(sheet_id))
+
+@pytest.fixture
+def gc(monkeypatch):
+    """Cliente falso con la caché de rifa_datos vacía, sin copia en disco y sin límite de cuota"""
+    monkeypatch.setattr(rifa_datos, "_snapshot_cache", {"lock": rifa_datos.threading.Lock(), "sheets": {}, "entries": {}, "load_locks": {}})
+    monkeypatch.setattr(rifa_datos, "governor", RateGovernor(10**6))
+    monkeypatch.setattr(rifa_persistencia, "SNAPSHOT_DIR", "")
+    return FakeClient()
+
+def sale(numero, vendedor="A", estado="vendido", fecha="2026-01-01 10:00:00", **fields):
+    """Fila de venta con valores por defecto"""
+    return dict({"fecha": fecha, "vendedor": vendedor, "numero": numero, "nombre_comprador": "Comprador",
+                 "telefono": "1", "email": "", "monto": 2500, "estado": estado, "observaciones": ""}, **fields)
@@ -0,0 +1,82 @@
+import http.client
+import json
+
+import pytest
+
+import rifa_api
+import rifa_datos
+from conftest import sale
+
+RAFFLES = {
+    "navidad": {"nombre": "Navidad", "sheet_id": "navidad", "particiones": None},
+    "escuela": {"nombre": "Escuela", "sheet_id": "escuela", "particiones": None},
+}
+
+@pytest.fixture
+def server(gc):
+    server = rifa_api.start_server(RAFFLES, 0, host="127.0.0.1")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path, **headers):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, dict(response.getheaders()), json.loads(body) if body else None
+
+def test_unknown_raffle_and_route_are_not_found(server):
+    assert get(server, "/disponibilidad?rifa=otra")[0] == 404
+
+def test_unloaded_raffle_answers_503_until_refreshed(server, gc):
+    rifa_datos.append_sales(gc, "escuela", [sale(1), sale(3)])
+    rifa_datos.get_snapshot_cache()["entries"].clear()
+
+    status, headers, _ = get(server, "/disponibilidad?rifa=escuela")
+    assert status == 503
+    assert headers["Retry-After"] == str(rifa_datos.PROBE_INTERVAL_SECONDS)
+
+    # El pedido la marca para el hilo de actualización
+    server.api.refresh(gc)
+    status, _, body = get(server, "/disponibilidad?rifa=escuela")
+    assert status == 200
+    assert (body["vendidos"], body["disponibles"]) == (2, 998)
+    assert get(server, "/disponibilidad/3?rifa=escuela")[2] == {"numero": 3, "disponible": False}
+    assert get(server, "/disponibilidad/2000?rifa=escuela")[0] == 404
+    assert get(server, "/otra?rifa=escuela")[0] == 404
+
+def test_etag_answers_304_until_the_data_changes(server, gc):
+    rifa_datos.append_sales(gc, "navidad", [sale(1)])
+    rifa_datos.get_snapshot(gc, "navidad", columns=rifa_datos.PUBLIC_COLUMNS)
+
+    status, headers, _ = get(server, "/resumen")
+    etag = headers["ETag"]
+    assert (status, headers["Age"]) == (200, "0")
+    assert get(server, "/resumen", **{"If-None-Match": etag})[0] == 304
+
+    rifa_datos.append_sales(gc, "navidad", [sale(2)])
+    status, headers, body = get(server, "/resumen", **{"If-None-Match": etag})
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert body["vendedores"] == {"A": {"ventas": 2, "monto": 5000.0}}
+
+def test_stale_data_answers_503(server, gc):
+    rifa_datos.append_sales(gc, "navidad", [sale(1)])
+    entry = rifa_datos.get_snapshot(gc, "navidad", columns=rifa_datos.PUBLIC_COLUMNS)
+    assert get(server, "/disponibilidad")[0] == 200
+
+    entry["probed_at"] -= rifa_api.MAX_STALE_SECONDS + 1
+    status, _, body = get(server, "/disponibilidad")
+    assert (status, body) == (503, {"error": "datos desactualizados"})
+
+def test_refresh_only_reads_requested_raffles(server, gc):
+    rifa_datos.append_sales(gc, "navidad", [sale(1)])
+    rifa_datos.append_sales(gc, "escuela", [sale(1)])
+    rifa_datos.get_snapshot_cache()["entries"].clear()
+    get(server, "/disponibilidad")
+
+    server.api.refresh(gc)
+
+    assert rifa_datos.cached_sheet_ids() == {"navidad"}
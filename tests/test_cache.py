@@ -0,0 +1,68 @@
+import pytest
+
+import rifa_datos
+import rifa_persistencia
+from conftest import sale
+
+def load(gc, *sheet_ids):
+    for sheet_id in sheet_ids:
+        rifa_datos.add_sale_to_sheet(gc, sheet_id, sale(1))
+        rifa_datos.get_snapshot(gc, sheet_id)
+
+def test_least_recently_used_raffles_are_evicted_over_the_limit(gc, monkeypatch):
+    monkeypatch.setattr(rifa_datos, "MAX_CACHED_RAFFLES", 2)
+    load(gc, "a", "b")
+    rifa_datos.get_snapshot(gc, "a")
+
+    load(gc, "c")
+
+    assert rifa_datos.cached_sheet_ids() == {"a", "c"}
+    cache = rifa_datos.get_snapshot_cache()
+    assert "b" not in cache["sheets"]
+    assert not [key for key in cache["load_locks"] if key[0] == "b"]
+
+def test_memory_budget_keeps_only_the_raffle_being_stored(gc, monkeypatch):
+    load(gc, "a", "b")
+    monkeypatch.setattr(rifa_datos, "CACHE_MEMORY_BUDGET_MB", 1e-6)
+
+    load(gc, "c")
+
+    assert rifa_datos.cached_sheet_ids() == {"c"}
+    assert rifa_datos.cache_stats()["rifas"] == 1
+
+def test_raffle_in_use_is_not_evicted(gc):
+    load(gc, "a")
+    key = rifa_datos._entry_key("a", "ventas", None)
+    with rifa_datos._load_lock(key):
+        assert rifa_datos._evict_raffle("a") is False
+    assert rifa_datos.cached_sheet_ids() == {"a"}
+    assert rifa_datos._evict_raffle("a") is True
+    assert rifa_datos.cached_sheet_ids() == set()
+
+def test_evicted_raffle_comes_back_from_disk_with_only_new_rows(gc, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(rifa_persistencia, "SNAPSHOT_DIR", str(tmp_path))
+    rifa_datos.append_sales(gc, "a", [sale(1), sale(2)])
+    rifa_datos.get_snapshot(gc, "a")
+    assert rifa_datos._evict_raffle("a")
+    rifa_persistencia._writer.submit(lambda: None).result()
+
+    rifa_datos.append_sales(gc, "a", [sale(3)])
+    sheet = gc.open_by_key("a")
+    reads = []
+    values_get = sheet.values_get
+    sheet.values_get = lambda name, **kwargs: reads.append(name) or values_get(name, **kwargs)
+    entry = rifa_datos.get_snapshot(gc, "a")
+
+    assert rifa_datos.absolute_range_name("ventas", "A4:ZZ") in reads
+    assert rifa_datos.absolute_range_name("ventas") not in reads
+    assert entry["df"]["numero"].tolist() == [1, 2, 3]
+
+def test_write_after_eviction_is_read_back(gc):
+    load(gc, "a")
+    assert rifa_datos._evict_raffle("a")
+
+    # La escritura no encuentra lecturas en memoria: la próxima lectura trae todo
+    rifa_datos.add_sale_to_sheet(gc, "a", sale(2))
+
+    assert rifa_datos.get_snapshot(gc, "a")["df"]["numero"].tolist() == [1, 2]
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import rifa_cli
+import rifa_datos
+from conftest import sale
+
+@pytest.fixture
+def secrets(tmp_path, gc, monkeypatch):
+    """Archivo de secrets con una sola rifa, conectado al cliente falso"""
+    monkeypatch.setattr(rifa_datos, "connect", lambda info: gc)
+    path = tmp_path / "secrets.toml"
+    path.write_text('GOOGLE_SHEET_ID = "rifa"\n\n[gcp_service_account]\ntype = "service_account"\n', encoding="utf-8")
+    return str(path)
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "ventas.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+def test_missing_secrets_file_exits_with_message(tmp_path):
+    with pytest.raises(SystemExit) as exit:
+        rifa_cli.main(["--secrets", str(tmp_path / "no.toml"), "resumen"])
+    assert "No se encontró el archivo de secrets" in str(exit.value.code)
+
+def test_import_rejects_numbers_repeated_in_the_file(tmp_path, secrets, gc, capsys):
+    archivo = write_csv(tmp_path, [sale(1), sale(2), sale(1, vendedor="B")])
+
+    assert rifa_cli.main(["--secrets", secrets, "importar", archivo]) == 1
+    assert "vendidos más de una vez en el archivo: 1" in capsys.readouterr().err
+    assert "ventas" not in gc.open_by_key("rifa").data
+
+def test_import_allows_resale_after_cancellation_in_the_file(tmp_path, secrets, gc):
+    archivo = write_csv(tmp_path, [sale(1), sale(1, estado="cancelado", fecha="2026-01-01 11:00:00"),
+                                   sale(1, vendedor="B", fecha="2026-01-01 12:00:00")])
+
+    assert rifa_cli.main(["--secrets", secrets, "importar", archivo]) == 0
+    assert len(gc.open_by_key("rifa").data["ventas"]) == 4
+
+def test_import_rejects_numbers_already_sold(tmp_path, secrets, gc, capsys):
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5))
+    archivo = write_csv(tmp_path, [sale(4), sale(5)])
+
+    assert rifa_cli.main(["--secrets", secrets, "importar", archivo]) == 1
+    assert "Números ya vendidos: 5" in capsys.readouterr().err
+    assert rifa_cli.main(["--secrets", secrets, "importar", archivo, "--forzar"]) == 0
@@ -0,0 +1,39 @@
+import pandas as pd
+
+import rifa_datos
+from conftest import sale
+
+CONFIG = rifa_datos.commission_config({
+    "tasa": 0.1,
+    "vendedores": {"STELLA": 0.2},
+    # Desordenados a propósito: se ordenan al normalizar
+    "tramos": [{"desde": 100, "tasa": 0.15}, {"desde": 50, "tasa": 0.12}],
+})
+
+def test_config_defaults_and_sorted_tiers():
+    assert rifa_datos.commission_config({}) == {"tasa": rifa_datos.DEFAULT_COMMISSION_RATE, "vendedores": {}, "tramos": []}
+    assert CONFIG["tramos"] == [(50, 0.12), (100, 0.15)]
+
+def test_rates_follow_tier_reached():
+    vendedores = ["A", "B", "C", "D", "E"]
+    rates = rifa_datos.commission_rates([0, 49, 50, 99, 100], vendedores, CONFIG)
+    assert rates.to_dict() == {"A": 0.1, "B": 0.1, "C": 0.12, "D": 0.12, "E": 0.15}
+
+def test_fixed_rate_overrides_tier():
+    rates = rifa_datos.commission_rates([5, 120], ["STELLA", "B"], CONFIG)
+    assert rates.to_dict() == {"STELLA": 0.2, "B": 0.15}
+
+def test_ledger_counts_current_sales_and_follows_config(gc):
+    rifa_datos.append_sales(gc, "rifa", [sale(1), sale(2), sale(3, vendedor="STELLA"), sale(2, estado="cancelado")])
+    entry = rifa_datos.get_snapshot(gc, "rifa")
+
+    ledger = rifa_datos.get_commission_ledger(entry, CONFIG)
+    assert ledger.values.tolist() == [["STELLA", 1, 2500, 0.2, 500.0], ["A", 1, 2500, 0.1, 250.0]]
+
+    flat = rifa_datos.commission_config({"tasa": 0.05})
+    ledger = rifa_datos.get_commission_ledger(entry, flat)
+    assert ledger.set_index("vendedor")["comision"].to_dict() == {"A": 125.0, "STELLA": 125.0}
+
+def test_empty_ledger_has_its_columns():
+    ledger = rifa_datos.compute_commissions(pd.DataFrame(columns=rifa_datos.ROLLUP_COLUMNS), CONFIG)
+    assert list(ledger.columns) == rifa_datos.LEDGER_COLUMNS and ledger.empty
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+import rifa_cuota
+from rifa_cuota import RateGovernor
+from conftest import FakeResponse
+
+class FakeClock:
+    """Reloj manual; dormir lo adelanta"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class RateLimited(Exception):
+    def __init__(self):
+        self.response = FakeResponse(429, "Quota exceeded")
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "tiempo de espera agotado"
+        time.sleep(0.005)
+
+def advance(governor, clock, seconds):
+    """Adelanta el reloj y despierta a quienes esperan una ficha"""
+    clock.now += seconds
+    with governor._cond:
+        governor._cond.notify_all()
+
+def test_writes_are_served_before_queued_reads():
+    clock = FakeClock()
+    governor = RateGovernor(60, burst=1, clock=clock, sleep=clock.sleep)
+    governor.acquire()
+    order = []
+    read = threading.Thread(target=governor.call, args=(order.append, "lectura"))
+    read.start()
+    wait_until(lambda: governor.stats()["lecturas_en_cola"] == 1)
+    write = threading.Thread(target=governor.call, args=(order.append, "escritura"), kwargs={"write": True})
+    write.start()
+    wait_until(lambda: governor.stats()["escrituras_en_cola"] == 1)
+
+    advance(governor, clock, 1)
+    write.join(5)
+    assert order == ["escritura"]
+    advance(governor, clock, 1)
+    read.join(5)
+    assert order == ["escritura", "lectura"]
+
+def test_identical_concurrent_reads_are_coalesced():
+    governor = RateGovernor(10**6)
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        release.wait(5)
+        return "valores"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(governor.call(read, key="rango"))) for _ in range(2)]
+    threads[0].start()
+    wait_until(lambda: calls)
+    threads[1].start()
+    wait_until(lambda: governor.stats()["lecturas_agrupadas"] == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["valores", "valores"]
+    assert len(calls) == 1
+    assert governor.stats()["lecturas_en_curso"] == 0
+
+def test_rate_limited_calls_back_off_and_retry():
+    clock = FakeClock()
+    governor = RateGovernor(60, clock=clock, sleep=clock.sleep)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert governor.call(flaky) == "ok"
+    assert clock.sleeps == [1, 2]
+    assert governor.stats()["reintentos"] == 2
+
+def test_rate_limited_gives_up_after_max_retries():
+    clock = FakeClock()
+    governor = RateGovernor(60, clock=clock, sleep=clock.sleep)
+
+    def always_limited():
+        raise RateLimited()
+
+    with pytest.raises(RateLimited):
+        governor.call(always_limited)
+    assert len(clock.sleeps) == rifa_cuota.MAX_RETRIES
+
+def test_other_errors_are_not_retried():
+    clock = FakeClock()
+    governor = RateGovernor(60, clock=clock, sleep=clock.sleep)
+
+    def broken():
+        raise ValueError("otro error")
+
+    with pytest.raises(ValueError):
+        governor.call(broken, key="rango")
+    assert clock.sleeps == []
+    assert governor.stats()["lecturas_en_curso"] == 0
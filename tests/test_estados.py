@@ -0,0 +1,128 @@
+import random
+
+import pandas as pd
+import pytest
+
+import rifa_datos
+from conftest import sale
+
+def random_sales(seed, count=300):
+    """Eventos al azar: pocos números, muchas fechas repetidas y algunos fuera de rango"""
+    rng = random.Random(seed)
+    return pd.DataFrame([
+        sale(rng.choice(list(range(1, 21)) + [0, 1001]),
+             vendedor=rng.choice("ABC"),
+             estado=rng.choice(["vendido", "vendido", "reservado", "cancelado"]),
+             fecha=f"2026-01-01 10:{rng.randrange(60):02d}:00")
+        for _ in range(count)
+    ])
+
+def fold_in_chunks(typed, cuts):
+    states = None
+    for start, end in zip([0] + cuts, cuts + [len(typed)]):
+        states = rifa_datos.fold_number_states(states, typed.iloc[start:end])
+    return states
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_fold_matches_full_rebuild(seed):
+    typed = rifa_datos.to_typed_frame(random_sales(seed))
+    cuts = sorted(random.Random(seed).sample(range(1, len(typed)), 6))
+    pd.testing.assert_frame_equal(fold_in_chunks(typed, cuts), rifa_datos.fold_number_states(None, typed))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_fold_matches_full_rebuild_with_shard_origin(seed):
+    # Como la vista particionada: filas agrupadas por hoja, no por fecha
+    df = random_sales(seed)
+    df.insert(0, "hoja", [f"ventas_{vendedor}" for vendedor in df["vendedor"]])
+    df = df.sort_values("hoja", kind="stable", ignore_index=True)
+    df.insert(1, "fila", df.groupby("hoja").cumcount() + 2)
+    typed = rifa_datos.to_typed_frame(df)
+    cuts = sorted(random.Random(seed).sample(range(1, len(typed)), 6))
+    pd.testing.assert_frame_equal(fold_in_chunks(typed, cuts), rifa_datos.fold_number_states(None, typed))
+
+def test_latest_event_wins_by_date_not_by_row():
+    states = rifa_datos.number_states(pd.DataFrame([
+        sale(5, vendedor="A", fecha="2026-01-01 12:00:00"),
+        sale(5, vendedor="B", fecha="2026-01-01 10:00:00"),
+        sale(5, vendedor="B", estado="cancelado", fecha="2026-01-01 11:00:00"),
+    ]))
+    assert states[["numero", "estado", "vendedor"]].values.tolist() == [[5, "vendido", "A"]]
+
+def test_out_of_range_numbers_are_not_states():
+    states = rifa_datos.number_states(pd.DataFrame([sale(0), sale(2000), sale(7), sale(8)]))
+    assert rifa_datos.get_sold_numbers(states) == [7, 8]
+    available = rifa_datos.get_available_numbers(states)
+    assert rifa_datos.get_sales_summary(states)["total_disponibles"] == len(available) == 998
+
+def test_sharded_resale_after_cancellation(gc):
+    shards = rifa_datos.shard_spec({"modo": "vendedor"})
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="B", fecha="2026-01-01 10:00:00"), shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+    assert rifa_datos.get_sold_numbers(rifa_datos.get_number_states(entry)) == [5]
+
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="B", estado="cancelado", fecha="2026-01-01 11:00:00"), shards=shards)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="A", fecha="2026-01-01 12:00:00"), shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+    states = rifa_datos.get_number_states(entry)
+
+    assert states[["numero", "estado", "vendedor"]].values.tolist() == [[5, "vendido", "A"]]
+    assert 5 not in rifa_datos.get_available_numbers(states)
+    pd.testing.assert_frame_equal(states, rifa_datos.number_states(entry["df"]))
+
+def test_public_projection_orders_events_by_date(gc):
+    # Las páginas públicas y la API leen solo PUBLIC_COLUMNS: también ahí manda la fecha
+    shards = rifa_datos.shard_spec({"modo": "vendedor"})
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="B", fecha="2026-01-01 10:00:00"), shards=shards)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="B", estado="cancelado", fecha="2026-01-01 11:00:00"), shards=shards)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="A", fecha="2026-01-01 12:00:00"), shards=shards)
+
+    entry = rifa_datos.get_snapshot(gc, "rifa", columns=rifa_datos.PUBLIC_COLUMNS, shards=shards)
+    states = rifa_datos.get_number_states(entry)
+
+    assert "nombre_comprador" not in entry["df"].columns
+    assert states[["numero", "estado", "vendedor"]].values.tolist() == [[5, "vendido", "A"]]
+    assert 5 not in rifa_datos.get_available_numbers(states)
+
+def test_hand_typed_dates_are_read_in_regional_format():
+    fechas = rifa_datos.parse_dates(pd.Series(["2026-01-13 09:05:00", "1/2/2026 11:00:00", "13/1/2026 9:05", "2026-01-02", "mañana", ""]))
+    assert fechas.dt.strftime("%Y-%m-%d %H:%M").tolist()[:4] == [
+        "2026-01-13 09:05", "2026-02-01 11:00", "2026-01-13 09:05", "2026-01-02 00:00"]
+    assert fechas[4:].isna().all()
+
+def test_hand_typed_cancellation_counts():
+    states = rifa_datos.number_states(pd.DataFrame([
+        sale(5, fecha="2026-01-01 10:00:00"),
+        sale(5, estado="cancelado", fecha="1/1/2026 11:00:00"),
+    ]))
+    assert states["estado"].tolist() == ["cancelado"]
+
+def test_unreadable_date_keeps_its_place_in_its_sheet(gc):
+    shards = rifa_datos.shard_spec({"modo": "vendedor"})
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="A", fecha="2026-01-01 09:00:00"), shards=shards)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="B", estado="cancelado", fecha="2026-01-01 10:00:00"), shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+    rifa_datos.get_number_states(entry)
+    # Reventa anotada a mano en la hoja de A con una fecha ilegible: va detrás de las 09:00, no al principio
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(6, vendedor="A", fecha="ayer"), shards=shards)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(5, vendedor="A", estado="cancelado", fecha="??"), shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+    states = rifa_datos.get_number_states(entry)
+
+    assert states[["numero", "estado", "vendedor"]].values.tolist() == [[5, "cancelado", "B"], [6, "vendido", "A"]]
+    pd.testing.assert_frame_equal(states, rifa_datos.number_states(entry["df"]))
+    problems = rifa_datos.scan_integrity(entry)
+    assert problems.loc[problems["problema"] == "fecha no válida", "numero"].tolist() == [6, 5]
+
+def test_unreadable_dates_fold_incrementally(gc):
+    rows = [sale(1), sale(1, estado="cancelado", fecha="?"), sale(2, fecha="2026-01-01 09:00:00"),
+            sale(1, vendedor="B", fecha="x"), sale(2, estado="cancelado", fecha="1/1/2026 08:00:00")]
+    for row in rows:
+        rifa_datos.add_sale_to_sheet(gc, "rifa", row)
+        rifa_datos.get_number_states(rifa_datos.get_snapshot(gc, "rifa"))
+    entry = rifa_datos.get_snapshot(gc, "rifa")
+    states = rifa_datos.get_number_states(entry)
+
+    pd.testing.assert_frame_equal(states, rifa_datos.number_states(entry["df"]))
+    # La venta de B sin fecha toma la de la fila anterior (09:00), anterior a la cancelación de las 10:00;
+    # la cancelación del 2 está fechada antes que su venta
+    assert states[["numero", "estado", "vendedor"]].values.tolist() == [[1, "cancelado", "A"], [2, "vendido", "A"]]
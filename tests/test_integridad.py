@@ -0,0 +1,32 @@
+import pandas as pd
+
+import rifa_datos
+from conftest import sale
+
+def test_incremental_integrity_matches_single_scan(gc):
+    rows = [sale(1), sale(2, estado="reservado"), sale(1, vendedor="B"), sale("abc"), sale(2000),
+            sale(3, monto="mucho"), sale(3, estado="cancelado", monto=""), sale(2, nombre_comprador="")]
+    for row in rows:
+        rifa_datos.add_sale_to_sheet(gc, "rifa", row)
+        rifa_datos.scan_integrity(rifa_datos.get_snapshot(gc, "rifa"))
+    incremental = rifa_datos.scan_integrity(rifa_datos.get_snapshot(gc, "rifa"))
+
+    fresh = rifa_datos._empty_entry()
+    fresh.update(df=rifa_datos.get_snapshot(gc, "rifa")["df"], rows=len(rows), worksheet="ventas")
+    pd.testing.assert_frame_equal(incremental, rifa_datos.scan_integrity(fresh))
+    assert set(incremental["problema"]) == {
+        "número vendido más de una vez", "número no numérico", "número fuera de rango",
+        "monto no numérico", "comprador vacío",
+    }
+
+def test_double_sale_flags_both_rows_and_resale_is_clean(gc):
+    rows = [sale(1), sale(2), sale(1, vendedor="B"), sale(2, estado="cancelado"), sale(2, vendedor="B")]
+    rifa_datos.append_sales(gc, "rifa", rows)
+
+    report = rifa_datos.scan_integrity(rifa_datos.get_snapshot(gc, "rifa"))
+
+    # Filas 2 y 4 de la hoja: la venta original y la que la pisa
+    assert report[["fila", "numero", "problema"]].values.tolist() == [
+        [2, 1, "número vendido más de una vez"],
+        [4, 1, "número vendido más de una vez"],
+    ]
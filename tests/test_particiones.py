@@ -0,0 +1,42 @@
+import pandas as pd
+
+import rifa_datos
+from conftest import sale
+
+def test_sharded_view_grows_incrementally(gc):
+    shards = rifa_datos.shard_spec({"modo": "rango", "tamano": 10})
+    rifa_datos.append_sales(gc, "rifa", [sale(numero) for numero in (1, 12, 25)], shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+    rifa_datos.get_number_states(entry)
+
+    rifa_datos.append_sales(gc, "rifa", [sale(3), sale(14)], shards=shards)
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+
+    assert sorted(entry["df"]["hoja"].unique()) == ["ventas_1", "ventas_2", "ventas_3"]
+    assert rifa_datos.get_sold_numbers(rifa_datos.get_number_states(entry)) == [1, 3, 12, 14, 25]
+    pd.testing.assert_frame_equal(rifa_datos.get_number_states(entry), rifa_datos.number_states(entry["df"]))
+
+def test_only_partition_sheets_are_discovered(gc):
+    sheet = gc.open_by_key("rifa")
+    for title in ["ventas", "ventas_10", "ventas_2", "ventas_otros", "ventas_backup", "ventas_ANA", "ventas_ANA_MARIA", "control"]:
+        sheet.add_worksheet(title, rows=1, cols=1)
+
+    rango = rifa_datos.shard_spec({"modo": "rango"})
+    vendedor = rifa_datos.shard_spec({"modo": "vendedor"})
+    assert rifa_datos.discover_shards(sheet, "ventas", rango) == ["ventas", "ventas_2", "ventas_10", "ventas_otros"]
+    # Un vendedor puede llamarse "2"; una hoja en minúsculas no la crea la aplicación
+    assert rifa_datos.discover_shards(sheet, "ventas", vendedor) == [
+        "ventas", "ventas_2", "ventas_10", "ventas_ANA", "ventas_ANA_MARIA", "ventas_otros"]
+    assert rifa_datos.discover_shards(sheet, "ventas") == ["ventas"]
+
+def test_backup_sheet_is_not_counted_as_sales(gc):
+    shards = rifa_datos.shard_spec({"modo": "rango", "tamano": 10})
+    rifa_datos.append_sales(gc, "rifa", [sale(1), sale(12)], shards=shards)
+    # Copia manual de una partición
+    sheet = gc.open_by_key("rifa")
+    sheet.data["ventas_backup"] = [row[:] for row in sheet.data["ventas_1"]] + [[str(v) for v in sale(5).values()]]
+
+    entry = rifa_datos.get_snapshot(gc, "rifa", shards=shards)
+
+    assert rifa_datos.get_sold_numbers(rifa_datos.get_number_states(entry)) == [1, 12]
+    assert rifa_datos.scan_integrity(entry).empty
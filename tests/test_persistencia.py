@@ -0,0 +1,58 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import rifa_datos
+import rifa_persistencia
+from conftest import sale
+
+def roundtrip(df):
+    table = rifa_persistencia._to_table(df, {})
+    return rifa_persistencia._restore_frame(table, json.loads(table.schema.metadata[b"rifa"]))
+
+def test_roundtrip_keeps_types_and_mixed_cells():
+    header = rifa_datos.SALE_COLUMNS
+    rows = [[str(value) for value in sale(numero).values()] for numero in range(1, 6)]
+    rows[1][header.index("telefono")] = "11-22"
+    rows[2][header.index("monto")] = "2500.5"
+    rows[3][header.index("numero")] = "abc"
+    df = rifa_datos._rows_to_frame(header, rows)
+
+    restored = roundtrip(df)
+
+    pd.testing.assert_frame_equal(restored, df)
+    assert [type(value) for value in restored["numero"]] == [int, int, int, str, int]
+    assert restored["monto"].tolist() == [2500, 2500, 2500.5, 2500, 2500]
+
+def test_load_entry_restores_saved_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(rifa_persistencia, "SNAPSHOT_DIR", str(tmp_path))
+    df = rifa_datos._rows_to_frame(rifa_datos.SALE_COLUMNS, [[str(value) for value in sale(7).values()]])
+    key = ("rifa", "ventas", None, None)
+    entry = {"df": df, "rows": 1, "revision": "3", "header": rifa_datos.SALE_COLUMNS, "worksheet": "ventas", "columns": None}
+    rifa_persistencia.save_entry(key, entry, force=True)
+    rifa_persistencia._writer.submit(lambda: None).result()
+
+    restored, metadata = rifa_persistencia.load_entry(key)
+
+    pd.testing.assert_frame_equal(restored, df)
+    assert (metadata["rows"], metadata["revision"]) == (1, "3")
+
+def test_load_entry_ignores_other_formats(tmp_path, monkeypatch):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    monkeypatch.setattr(rifa_persistencia, "SNAPSHOT_DIR", str(tmp_path))
+    key = ("rifa", "ventas", None, None)
+    old = pa.table({"numero": ["1"]}).replace_schema_metadata({"rifa": json.dumps({"rows": 1})})
+    feather.write_feather(old, rifa_persistencia._path(key))
+    assert rifa_persistencia.load_entry(key) is None
+
+def test_snapshot_dir_does_not_depend_on_working_directory(tmp_path, monkeypatch):
+    app_dir = os.path.dirname(os.path.abspath(rifa_persistencia.__file__))
+    monkeypatch.chdir(tmp_path)
+    assert rifa_persistencia._resolve_dir(".cache/rifa") == os.path.join(app_dir, ".cache/rifa")
+    assert rifa_persistencia._resolve_dir(str(tmp_path / "copias")) == str(tmp_path / "copias")
+    assert rifa_persistencia._resolve_dir("") == ""
@@ -0,0 +1,54 @@
+import pandas as pd
+
+import rifa_datos
+from conftest import sale
+
+def sheet_rows(sales):
+    """Filas de la hoja como las devuelve la API: texto, con encabezados"""
+    return [rifa_datos.SALE_COLUMNS] + [[str(sale[column]) for column in rifa_datos.SALE_COLUMNS] for sale in sales]
+
+def test_fetch_columns_reads_only_the_requested_columns(gc):
+    sheet = gc.open_by_key("rifa")
+    # La última fila sin vendedor: la API no devuelve esa celda vacía
+    sheet.data["ventas"] = sheet_rows([sale(1), sale(2), sale(3, vendedor="")])
+    header = rifa_datos.SALE_COLUMNS
+
+    df, n = rifa_datos._fetch_columns(sheet, "ventas", header, ("numero", "vendedor", "no_existe"), 3)
+
+    assert n == 2
+    assert list(df.columns) == ["numero", "vendedor"]
+    assert df.values.tolist() == [[2, "A"], [3, ""]]
+
+def test_projection_has_no_buyer_data_and_matches_full_read(gc):
+    rifa_datos.append_sales(gc, "rifa", [sale(1), sale(2, estado="reservado"), sale(1, estado="cancelado")])
+
+    public = rifa_datos.get_snapshot(gc, "rifa", columns=rifa_datos.PUBLIC_COLUMNS)
+    full = rifa_datos.get_snapshot(gc, "rifa")
+
+    assert list(public["df"].columns) == list(rifa_datos.PUBLIC_COLUMNS)
+    pd.testing.assert_frame_equal(public["df"], full["df"][list(rifa_datos.PUBLIC_COLUMNS)])
+    assert rifa_datos.get_available_numbers(rifa_datos.get_number_states(public)) == \
+        rifa_datos.get_available_numbers(rifa_datos.get_number_states(full))
+
+def test_projected_delta_fetches_new_rows_in_one_request(gc, monkeypatch):
+    monkeypatch.setattr(rifa_datos, "PROBE_INTERVAL_SECONDS", 0)
+    rifa_datos.append_sales(gc, "rifa", [sale(1), sale(2)])
+    rifa_datos.get_snapshot(gc, "rifa", columns=rifa_datos.PUBLIC_COLUMNS)
+
+    # Otro proceso escribe dos filas y actualiza la revisión
+    sheet = gc.open_by_key("rifa")
+    sheet.data["ventas"] += sheet_rows([sale(3), sale(1, estado="cancelado", monto="")])[1:]
+    sheet.cells[(rifa_datos.CONTROL_WORKSHEET, "B1")] = "otra"
+    batches = []
+    values_batch_get = sheet.values_batch_get
+    sheet.values_batch_get = lambda ranges, **kwargs: batches.append(ranges) or values_batch_get(ranges, **kwargs)
+
+    entry = rifa_datos.get_snapshot(gc, "rifa", columns=rifa_datos.PUBLIC_COLUMNS)
+
+    assert len(batches) == 1
+    # Desde la primera fila nueva (encabezado y dos filas leídas), solo fecha, numero, estado, vendedor y monto
+    assert batches[0] == [rifa_datos.absolute_range_name("ventas", f"{letter}4:{letter}") for letter in "ACHBG"]
+    assert entry["rows"] == 4
+    assert entry["df"]["numero"].tolist() == [1, 2, 3, 1]
+    assert entry["df"]["monto"].tolist()[-1] == ""
+    assert rifa_datos.get_sold_numbers(rifa_datos.get_number_states(entry)) == [2, 3]
@@ -0,0 +1,43 @@
+import pytest
+
+import rifa_datos
+from conftest import FakeResponse, sale
+
+def count_reads(sheet):
+    """Cuenta los rangos pedidos a la hoja"""
+    reads = []
+    values_get = sheet.values_get
+    sheet.values_get = lambda name, **kwargs: reads.append(name) or values_get(name, **kwargs)
+    return reads
+
+def test_missing_control_sheet_means_no_revision(gc):
+    assert rifa_datos.get_revision(gc.open_by_key("rifa")) is None
+
+def test_other_api_errors_propagate_from_revision(gc):
+    sheet = gc.open_by_key("rifa")
+    sheet.values_get = lambda *args, **kwargs: (_ for _ in ()).throw(
+        rifa_datos.gspread.exceptions.APIError(FakeResponse(503, "backend")))
+    with pytest.raises(rifa_datos.gspread.exceptions.APIError):
+        rifa_datos.get_revision(sheet)
+
+def test_writes_bump_the_revision(gc):
+    sheet = gc.open_by_key("rifa")
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(1))
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(2))
+    assert rifa_datos.get_revision(sheet) == "2"
+
+def test_unchanged_revision_only_reads_the_control_cell(gc, monkeypatch):
+    monkeypatch.setattr(rifa_datos, "PROBE_INTERVAL_SECONDS", 0)
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(1))
+    rifa_datos.get_snapshot(gc, "rifa")
+    reads = count_reads(gc.open_by_key("rifa"))
+
+    rifa_datos.get_snapshot(gc, "rifa")
+    assert reads == [rifa_datos.absolute_range_name(rifa_datos.CONTROL_WORKSHEET, "B1")]
+
+    rifa_datos.add_sale_to_sheet(gc, "rifa", sale(2))
+    reads.clear()
+    entry = rifa_datos.get_snapshot(gc, "rifa")
+    # La escritura ya aplicó su fila a la caché: solo se piden las posteriores
+    assert reads[1] == rifa_datos.absolute_range_name("ventas", "A4:ZZ")
+    assert entry["df"]["numero"].tolist() == [1, 2]
@@ -0,0 +1,58 @@
+import datetime
+
+import pandas as pd
+
+import rifa_datos
+from conftest import sale
+
+def daily(counts):
+    """Ventas por día a partir de {fecha: cantidad}"""
+    return pd.DataFrame({"ventas": list(counts.values()), "monto": 0},
+                        index=pd.to_datetime(list(counts)))
+
+def test_incremental_rollups_match_single_pass(gc):
+    rows = [sale(1, fecha="2026-01-01 10:15:00"), sale(2, vendedor="B", fecha="2026-01-01 11:00:00"),
+            sale(1, estado="cancelado", fecha="2026-01-02 09:00:00"), sale(3, fecha="2026-01-02 09:30:00"),
+            sale(1, vendedor="B", fecha="2026-01-03 18:00:00")]
+    for row in rows:
+        rifa_datos.add_sale_to_sheet(gc, "rifa", row)
+        rifa_datos.get_rollups(rifa_datos.get_snapshot(gc, "rifa"))
+    incremental = rifa_datos.get_rollups(rifa_datos.get_snapshot(gc, "rifa"))
+
+    fresh = rifa_datos._empty_entry()
+    fresh.update(df=rifa_datos.get_snapshot(gc, "rifa")["df"], rows=len(rows), worksheet="ventas")
+    single = rifa_datos.get_rollups(fresh)
+    for name in ("hora", "dia", "vendedor", "dia_vigentes"):
+        pd.testing.assert_frame_equal(incremental[name], single[name], check_dtype=False)
+
+    assert incremental["vendedor"]["ventas"].to_dict() == {"A": 1, "B": 2}
+    # Por día se cuentan los eventos; la venta cancelada del día 1 sigue contando ese día
+    assert incremental["dia"]["ventas"].tolist() == [2, 1, 1]
+
+def test_current_sales_by_day_leave_out_cancellations(gc):
+    rifa_datos.append_sales(gc, "rifa", [
+        sale(1, fecha="2026-01-01 10:00:00"), sale(2, fecha="2026-01-01 11:00:00"),
+        sale(1, estado="cancelado", fecha="2026-01-02 09:00:00"), sale(3, fecha="2026-01-02 10:00:00"),
+    ])
+    entry = rifa_datos.get_snapshot(gc, "rifa")
+
+    vigentes = rifa_datos.get_rollups(entry)["dia_vigentes"]["ventas"]
+
+    assert vigentes.to_dict() == {pd.Timestamp("2026-01-01"): 1, pd.Timestamp("2026-01-02"): 1}
+    assert vigentes.sum() == rifa_datos.get_sales_summary(rifa_datos.get_number_states(entry))["total_vendidos"]
+
+def test_forecast_window_ends_today():
+    # Siete ventas hace un mes y ninguna desde entonces: el ritmo actual es cero
+    assert rifa_datos.forecast_sell_out(daily({"2026-01-01": 7}), 7, today=datetime.date(2026, 2, 1)) is None
+
+    forecast = rifa_datos.forecast_sell_out(
+        daily({"2026-01-01": 100, "2026-01-26": 7, "2026-01-30": 7}), 114, today=datetime.date(2026, 2, 1))
+    assert forecast["ventas_por_dia"] == 2
+    assert round(forecast["dias_restantes"]) == 443
+
+def test_forecast_of_a_new_raffle_uses_its_days():
+    forecast = rifa_datos.forecast_sell_out(daily({"2026-01-30": 4, "2026-01-31": 2}), 6, today=datetime.date(2026, 1, 31))
+    assert forecast["ventas_por_dia"] == 3
+
+def test_no_forecast_when_sold_out():
+    assert rifa_datos.forecast_sell_out(daily({"2026-01-01": 10}), 10, total_numbers=10) is None